@@ -0,0 +1,222 @@
+"""Benchmark: trace every program in core.examples.EXAMPLES (and scaled-up
+variants of a few) and report steps/sec, tracer overhead, serializer share,
+peak RSS and trace file size.
+
+    python -m benchmarks.bench_examples [-o results.json] [--repeat N]
+                                        [--case TITLE ...] [--baseline old.json]
+
+Each case runs in a fresh interpreter so its peak RSS is its own. The JSON
+output is meant to be kept and compared across commits (--baseline prints
+the steps/sec change against an earlier file). A case whose interpreter
+crashes is recorded as {"title": ..., "failed": reason} and the rest still run.
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from core.cli import peak_rss_kb
+from core.examples import EXAMPLES
+from core.executor import Executor
+from core.tracefile import write_trace
+from utils.serializer import SerializerSession
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# (title of the base example, scaled title, [(old, new), ...])
+SCALED = [
+    ("Recursion — Fibonacci", "Recursion — Fibonacci (n=16)", [("range(8)", "range(16)")]),
+    ("Sorting — Bubble Sort", "Sorting — Bubble Sort (60 items)",
+     [("[64, 34, 25, 12, 22, 11, 90]", "[(i * 37) % 101 for i in range(60)]")]),
+    ("Primes - Sieve of Eratosthenes", "Primes - Sieve of Eratosthenes (n=3000)",
+     [("sieve(30)", "sieve(3000)")]),
+]
+
+
+def build_cases():
+    cases = {e["title"]: e["code"] for e in EXAMPLES}
+    for base, title, replacements in SCALED:
+        code = cases[base]
+        for old, new in replacements:
+            if old not in code:
+                raise ValueError(f"{base!r} no longer contains {old!r}")
+            code = code.replace(old, new)
+        cases[title] = code
+    return cases
+
+
+class _SerializerClock:
+    """Times SerializerSession.serialize while installed (outermost calls only)."""
+
+    def __init__(self):
+        self.seconds = 0.0
+        self._depth = 0
+        self._original = None
+
+    def __enter__(self):
+        original = self._original = SerializerSession.serialize
+        clock = self
+
+        def serialize(session, obj):
+            if clock._depth:
+                return original(session, obj)
+            clock._depth += 1
+            started = time.perf_counter()
+            try:
+                return original(session, obj)
+            finally:
+                clock.seconds += time.perf_counter() - started
+                clock._depth -= 1
+
+        SerializerSession.serialize = serialize
+        return self
+
+    def __exit__(self, *exc):
+        SerializerSession.serialize = self._original
+
+
+def _untraced(code_obj):
+    started = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        exec(code_obj, {})
+    return time.perf_counter() - started
+
+
+def measure(code, repeat=3, max_steps=1_000_000):
+    """Benchmark one program in this process; returns a result dict."""
+    code_obj = compile(code, "<string>", "exec")
+    untraced = min(_untraced(code_obj) for _ in range(repeat))
+
+    best = None
+    for _ in range(repeat):
+        executor = Executor(code=code, timeout=120.0, max_steps=max_steps)
+        with _SerializerClock() as clock:
+            started = time.perf_counter()
+            result = executor.execute()
+            traced = time.perf_counter() - started
+        if best is None or traced < best[0]:
+            best = (traced, clock.seconds, executor, result)
+    traced, serializer_seconds, executor, result = best
+
+    steps = len(result["steps"])
+    fd, path = tempfile.mkstemp(suffix=".pvtrace")
+    os.close(fd)
+    try:
+        started = time.perf_counter()
+        write_trace(path, executor.tracer, code, result["error"])
+        write_seconds = time.perf_counter() - started
+        trace_bytes = os.path.getsize(path)
+    finally:
+        os.remove(path)
+    executor.tracer.trace_data.close()
+
+    return {
+        "steps": steps,
+        "error": result["error"],
+        "limit_reached": result["limit_reached"],
+        "untraced_seconds": round(untraced, 6),
+        "traced_seconds": round(traced, 6),
+        "steps_per_sec": round(steps / traced, 1) if traced > 0 else 0.0,
+        "overhead_us_per_step": round((traced - untraced) / steps * 1e6, 2) if steps else 0.0,
+        "serializer_share": round(serializer_seconds / traced, 4) if traced > 0 else 0.0,
+        "write_seconds": round(write_seconds, 6),
+        "trace_bytes": trace_bytes,
+        "peak_rss_kb": peak_rss_kb(),
+    }
+
+
+def _run_case(title, repeat):
+    """Run one case in a fresh interpreter and return its result dict, or
+    {"failed": reason} when the child crashed."""
+    proc = subprocess.run(
+        [sys.executable, "-m", "benchmarks.bench_examples", "--child", title,
+         "--repeat", str(repeat)],
+        cwd=PROJECT_ROOT, capture_output=True, text=True,
+    )
+    if proc.returncode == 0:
+        try:
+            return json.loads(proc.stdout)
+        except ValueError:
+            pass
+    lines = proc.stderr.strip().splitlines()
+    return {"failed": lines[-1] if lines else f"exit status {proc.returncode}"}
+
+
+def _git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=PROJECT_ROOT, capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("-o", "--out", default="bench_examples.json", help="JSON results file")
+    parser.add_argument("--repeat", type=int, default=3, help="runs per case (best is kept)")
+    parser.add_argument("--case", action="append", default=[], help="only run these titles")
+    parser.add_argument("--baseline", help="earlier results file to compare steps/sec against")
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    cases = build_cases()
+    if args.child is not None:
+        json.dump(measure(cases[args.child], repeat=args.repeat), sys.stdout)
+        return 0
+
+    titles = args.case or list(cases)
+    unknown = [t for t in titles if t not in cases]
+    if unknown:
+        parser.error(f"unknown case(s): {', '.join(unknown)}")
+
+    baseline = {}
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = {c["title"]: c for c in json.load(f)["cases"]}
+
+    print(f"{'case':<42}{'steps':>8}{'steps/sec':>12}{'us/step':>9}{'ser %':>7}"
+          f"{'RSS MB':>8}{'trace KB':>10}")
+    results = []
+    for title in titles:
+        row = {"title": title, **_run_case(title, args.repeat)}
+        results.append(row)
+        if "failed" in row:
+            print(f"{title:<42}  failed: {row['failed']}")
+            continue
+        rss = row["peak_rss_kb"]
+        line = (
+            f"{title:<42}{row['steps']:>8}{row['steps_per_sec']:>12.0f}"
+            f"{row['overhead_us_per_step']:>9.1f}{row['serializer_share'] * 100:>7.1f}"
+            f"{(rss / 1024 if rss is not None else 0):>8.1f}{row['trace_bytes'] / 1024:>10.1f}"
+        )
+        old = baseline.get(title)
+        if old and old.get("steps_per_sec"):
+            change = row["steps_per_sec"] / old["steps_per_sec"] - 1
+            line += f"  {change:+.1%} vs baseline"
+        print(line)
+
+    report = {
+        "commit": _git_commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cases": results,
+    }
+    with open(args.out, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+    print(f"wrote {args.out}")
+    return 1 if any("failed" in row for row in results) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,75 @@
+"""Micro-benchmark: Serializer vs a warm SerializerSession on unchanged values.
+
+    python -m benchmarks.bench_serializer [--repeat N]
+"""
+
+import argparse
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from utils.serializer import Serializer, SerializerSession
+
+
+class Node:
+    def __init__(self, val, next=None):
+        self.val = val
+        self.next = next
+
+
+class Tree:
+    def __init__(self, val, left=None, right=None):
+        self.val = val
+        self.left = left
+        self.right = right
+
+
+def build_tree(depth):
+    if depth == 0:
+        return None
+    return Tree(depth, build_tree(depth - 1), build_tree(depth - 1))
+
+
+def build_cases():
+    return {
+        "nested lists": [[[i, j, str(i * j)] for j in range(20)] for i in range(20)],
+        "nested dicts": {f"k{i}": {f"v{j}": [j, j * 2] for j in range(20)} for i in range(20)},
+        "custom objects": [Node(i, Node(i + 1, Node(i + 2))) for i in range(20)],
+        "binary tree": build_tree(6),
+        "mixed": {"items": list(range(50)), "node": Node(1), "grid": [[0] * 8 for _ in range(8)]},
+    }
+
+
+def run(repeat):
+    rows = []
+    for label, value in build_cases().items():
+        serializers = {"serializer": Serializer(), "session": SerializerSession()}
+        outputs = [s.serialize(value) for s in serializers.values()]
+        if outputs[1] != outputs[0]:
+            raise AssertionError(f"session disagrees on {label!r}")
+
+        timings = {}
+        for name, serializer in serializers.items():
+            runs = timeit.repeat(lambda: serializer.serialize(value), number=repeat, repeat=5)
+            timings[name] = min(runs) / repeat * 1e6
+        rows.append((label, timings))
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=200, help="calls per timing run")
+    args = parser.parse_args()
+
+    names = ("serializer", "session")
+    print(f"{'case':<16}" + "".join(f"{n + ' (us)':>18}" for n in names) + f"{'speedup':>10}")
+    for label, timings in run(args.repeat):
+        cells = "".join(f"{timings[n]:>18.1f}" for n in names)
+        speedup = timings["serializer"] / timings["session"]
+        print(f"{label:<16}{cells}{speedup:>9.2f}x")
+
+
+if __name__ == "__main__":
+    main()
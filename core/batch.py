@@ -0,0 +1,102 @@
+"""Batch execution: run many programs across a pool of worker processes.
+
+    for result in run_batch(jobs, workers=8, timeout=5.0):
+        grade(result["index"], result["stdout"], result["error"])
+
+Jobs are (code, inputs) pairs and are read lazily from the iterable. Each
+one runs non-interactively in a pooled worker (see core.worker): input()
+past the scripted inputs raises EOFError, and only a summary comes back,
+never the steps. Results are yielded in order of completion, and no more
+than `max_pending` jobs are taken from the iterable before their results
+have been consumed, so memory stays flat however many jobs there are.
+"""
+
+import os
+import queue
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from core.worker import WorkerPool
+
+# seconds a worker gets past the job's own timeout (the worker abandons the
+# traced thread after a further 1s join) before it is killed
+KILL_GRACE = 2.0
+
+
+def _run_job(pool, index, code, inputs, timeout, max_steps, backend, profile):
+    result = {
+        "index": index,
+        "error": None,
+        "steps": 0,
+        "stdout": "",
+        "counts": {},
+        "profile": None,
+        "limit_reached": False,
+    }
+    started = time.monotonic()
+    worker = pool.acquire()
+    worker.send(("batch", code, list(inputs or ()), timeout, max_steps, backend, profile))
+    try:
+        msg = worker.messages.get(timeout=timeout + KILL_GRACE)
+    except queue.Empty:
+        msg = ("killed",)
+
+    if msg[0] == "result":
+        _, summary, reusable = msg
+        result.update(summary)
+        if reusable:
+            pool.release(worker)
+        else:
+            pool.discard(worker)
+    else:
+        if msg[0] == "killed":
+            result["error"] = "ExecutionTimeout: Worker killed after timeout."
+            result["limit_reached"] = True
+        else:
+            result["error"] = "WorkerCrashed: Worker process exited unexpectedly."
+        pool.discard(worker)
+    result["seconds"] = round(time.monotonic() - started, 4)
+    return result
+
+
+def run_batch(jobs, workers=None, timeout=10.0, max_steps=10000,
+              backend="monitoring", max_pending=None, profile=False):
+    """Run (code, inputs) jobs in parallel; yield result dicts as they finish.
+
+    Each result has the job's position in `jobs` as "index", plus "error",
+    "steps" (count), "stdout", "counts" (line counts), "profile" (see
+    core.profiler; None unless `profile` is set), "limit_reached" and
+    "seconds". `timeout` and `max_steps` apply to every job separately.
+    """
+    workers = workers or os.cpu_count() or 1
+    max_pending = max(max_pending or workers, 1)
+    pool = WorkerPool(size=workers)
+    threads = ThreadPoolExecutor(max_workers=workers)
+    jobs = enumerate(jobs)
+    pending = set()
+
+    def fill():
+        while len(pending) < max_pending:
+            try:
+                index, (code, inputs) = next(jobs)
+            except StopIteration:
+                return
+            pending.add(threads.submit(
+                _run_job, pool, index, code, inputs, timeout, max_steps, backend, profile
+            ))
+
+    try:
+        fill()
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                pending.discard(future)
+                # refill first so the workers stay busy while the consumer
+                # handles this result
+                fill()
+                yield future.result()
+    finally:
+        # an abandoned generator still waits for the jobs already running
+        # (each bounded by its timeout), but starts no new ones
+        threads.shutdown(wait=True, cancel_futures=True)
+        pool.shutdown()
@@ -0,0 +1,256 @@
+"""Headless batch tracing: ``python -m core trace script.py [...]``.
+
+Nothing here (or in what it imports) may pull in Kivy; the import time of
+this module is budgeted by tests/test_cli.py.
+"""
+
+import argparse
+import json
+import os
+import queue
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+from core.executor import Executor
+from core.tracefile import SUFFIX, write_trace
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# seconds a script's process gets past --timeout (the executor abandons the
+# traced thread after a further 1s join) before it is killed
+KILL_GRACE = 2.0
+
+# a child's first line once its program has stopped
+RAN = b"ran\n"
+
+
+def peak_rss_kb():
+    """High-water resident size of this process, or None if unknown."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # bytes on macOS, kilobytes elsewhere
+    return peak // 1024 if sys.platform == "darwin" else peak
+
+
+def trace_script(path, out_dir=None, inputs=None, timeout=10.0, max_steps=1_000_000,
+                 backend="monitoring", trace_name=None, stats=False, profile=False,
+                 sample_after=None, sample_target=100000, ran=None):
+    """Trace one script in this process and return its summary (written to
+    `out_dir`). `ran` is called once the program has stopped, before the
+    trace is written.
+
+    A program the tracer cannot stop keeps this process alive; main() runs
+    every script in a child process (see run_script) for that reason, which
+    also makes ``peak_rss_kb`` the script's own peak.
+    """
+    summary = {"script": path, "steps": 0, "seconds": 0.0, "steps_per_sec": 0.0}
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            code = f.read()
+    except (OSError, UnicodeDecodeError) as e:
+        return _failed(summary, f"{type(e).__name__}: {e}")
+
+    executor = Executor(
+        code=code,
+        inputs=inputs,
+        timeout=timeout,
+        max_steps=max_steps,
+        backend=backend,
+        interactive=False,
+        stats=stats,
+        profile=profile,
+        sample_after=sample_after,
+        sample_target=sample_target,
+    )
+    started = time.perf_counter()
+    try:
+        result = executor.execute()
+    except SyntaxError as e:
+        return _failed(summary, f"SyntaxError: {e}")
+    elapsed = time.perf_counter() - started
+    if ran is not None:
+        ran()
+
+    steps = len(result["steps"])
+    summary.update(
+        steps=steps,
+        seconds=round(elapsed, 4),
+        steps_per_sec=round(steps / elapsed, 1) if elapsed > 0 else 0.0,
+        peak_rss_kb=peak_rss_kb(),
+        error=result["error"],
+        limit_reached=result["limit_reached"],
+        # JSON object keys must be strings
+        line_counts={str(k): v for k, v in sorted(result["counts"].items())},
+        sampled_from=executor.tracer.sampled_from,
+    )
+    if profile:
+        summary["profile"] = result["profile"]
+    if stats:
+        summary["stats"] = result["stats"]
+    if out_dir is not None:
+        name = trace_name or os.path.splitext(os.path.basename(path))[0]
+        trace_path = os.path.join(out_dir, name + SUFFIX)
+        write_trace(trace_path, executor.tracer, code, result["error"])
+        summary["trace"] = trace_path
+    return summary
+
+
+def _failed(summary, error, limit_reached=False):
+    summary.update(error=error, limit_reached=limit_reached, line_counts={}, peak_rss_kb=None)
+    return summary
+
+
+def run_script(path, options, timeout=10.0):
+    """Trace one script in a fresh interpreter and return its summary.
+
+    `options` are extra ``trace`` arguments for the child. A child still
+    running `KILL_GRACE` seconds past `timeout` is killed, so a program the
+    tracer cannot stop costs the batch no more than that; once it reports
+    that the program has stopped, writing its trace is not timed.
+    """
+    summary = {"script": path, "steps": 0, "seconds": 0.0, "steps_per_sec": 0.0}
+    env = os.environ.copy()
+    env["PYTHONPATH"] = os.pathsep.join(p for p in (PROJECT_ROOT, env.get("PYTHONPATH")) if p)
+    with tempfile.TemporaryFile() as stderr:
+        child = subprocess.Popen(
+            [sys.executable, "-m", "core", "trace", "--child", "--timeout", str(timeout),
+             *options, "--", path],
+            stdout=subprocess.PIPE, stderr=stderr, env=env,
+        )
+        lines = queue.Queue()
+
+        def read():
+            for line in child.stdout:
+                lines.put(line)
+            lines.put(b"")
+
+        threading.Thread(target=read, daemon=True).start()
+        try:
+            first = lines.get(timeout=timeout + KILL_GRACE)
+        except queue.Empty:
+            child.kill()
+            child.wait()
+            return _failed(summary, "ExecutionTimeout: Script killed after timeout.", True)
+        last = lines.get() if first == RAN else first
+        child.wait()
+        child.stdout.close()
+        if child.returncode == 0 and last:
+            return json.loads(last)
+        stderr.seek(0)
+        tail = stderr.read().decode("utf-8", "replace").strip().splitlines()[-1:]
+        return _failed(summary, "ScriptCrashed: " + (tail[0] if tail else f"exit code {child.returncode}"))
+
+
+def _run_child(args):
+    """Child side of run_script: trace ``args.scripts[0]``, print b"ran"
+    once the program stops, then the summary as one JSON line."""
+    # the protocol gets its own copy of stdout; whatever the program (or a
+    # thread it left running) writes to fd 1 goes nowhere
+    out = os.fdopen(os.dup(1), "wb")
+    devnull = os.open(os.devnull, os.O_WRONLY)
+    os.dup2(devnull, 1)
+    os.close(devnull)
+
+    def ran():
+        out.write(RAN)
+        out.flush()
+
+    summary = trace_script(
+        args.scripts[0],
+        out_dir=None if args.no_traces else args.out,
+        inputs=args.inputs,
+        timeout=args.timeout,
+        max_steps=args.max_steps,
+        backend=args.backend,
+        trace_name=args.trace_name,
+        stats=args.stats,
+        profile=args.profile,
+        sample_after=args.sample_after,
+        sample_target=args.sample_target,
+        ran=ran,
+    )
+    out.write(json.dumps(summary).encode("utf-8") + b"\n")
+    out.flush()
+    # a program the tracer abandoned is still running; don't wait for it
+    os._exit(0)
+
+
+def _unique_names(paths):
+    names, seen = [], {}
+    for path in paths:
+        name = os.path.splitext(os.path.basename(path))[0]
+        count = seen.get(name, 0)
+        seen[name] = count + 1
+        names.append(name if count == 0 else f"{name}-{count}")
+    return names
+
+
+def _print_row(summary, out):
+    status = summary["error"] or ("limit reached" if summary["limit_reached"] else "ok")
+    peak = summary["peak_rss_kb"]
+    peak = f"{peak / 1024:.1f}" if peak is not None else "-"
+    out.write(
+        f"{os.path.basename(summary['script']):<28}{summary['steps']:>10}"
+        f"{summary['steps_per_sec']:>14.1f}{peak:>12}  {status}\n"
+    )
+
+
+def main(argv=None, out=sys.stdout):
+    parser = argparse.ArgumentParser(prog="python -m core", description="Headless tracing.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    trace = commands.add_parser("trace", help="trace scripts and write traces / summaries")
+    trace.add_argument("scripts", nargs="+", help="Python files to trace")
+    trace.add_argument("-o", "--out", default="traces", help="output directory (default: traces)")
+    trace.add_argument("-i", "--input", action="append", default=[], dest="inputs",
+                       help="line fed to input(); repeat for several lines")
+    trace.add_argument("--timeout", type=float, default=10.0, help="seconds per script")
+    trace.add_argument("--max-steps", type=int, default=1_000_000)
+    trace.add_argument("--backend", choices=("monitoring", "settrace"), default="monitoring")
+    trace.add_argument("--no-traces", action="store_true",
+                       help="only write summary.json, no .pvtrace files")
+    trace.add_argument("--stats", action="store_true",
+                       help="add the tracer's own phase timings to summary.json")
+    trace.add_argument("--profile", action="store_true",
+                       help="time each line and function (slower; summary.json and traces)")
+    trace.add_argument("--sample-after", type=int, metavar="N",
+                       help="keep every step for N events, then sample line steps")
+    trace.add_argument("--sample-target", type=int, default=100000, metavar="STEPS",
+                       help="trace size sampling aims for (default: 100000)")
+    # internal: run_script's child process
+    trace.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    trace.add_argument("--trace-name", help=argparse.SUPPRESS)
+
+    args = parser.parse_args(argv)
+    if args.child:
+        _run_child(args)
+    os.makedirs(args.out, exist_ok=True)
+
+    options = [f"--out={args.out}", f"--max-steps={args.max_steps}", f"--backend={args.backend}",
+               f"--sample-target={args.sample_target}"]
+    options += [f"--input={line}" for line in args.inputs]
+    if args.sample_after is not None:
+        options.append(f"--sample-after={args.sample_after}")
+    for flag in ("no_traces", "stats", "profile"):
+        if getattr(args, flag):
+            options.append("--" + flag.replace("_", "-"))
+
+    out.write(f"{'script':<28}{'steps':>10}{'steps/sec':>14}{'peak MB':>12}  status\n")
+    summaries = []
+    for path, name in zip(args.scripts, _unique_names(args.scripts)):
+        summary = run_script(path, options + [f"--trace-name={name}"], timeout=args.timeout)
+        summaries.append(summary)
+        _print_row(summary, out)
+
+    with open(os.path.join(args.out, "summary.json"), "w", encoding="utf-8") as f:
+        json.dump(summaries, f, indent=2)
+    return 1 if any(s["error"] for s in summaries) else 0
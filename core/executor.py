@@ -1,11 +1,12 @@
 import sys
 import io
 import contextlib
+import queue
 import threading
 import time
 
 from core.parser import CodeParser
-from core.tracer import Tracer, ExecutionLimitReached
+from core.tracer import Tracer, MonitoringTracer, ExecutionLimitReached
 
 
 class ExecutionTimeout(Exception):
@@ -20,42 +21,127 @@ class Executor:
         timeout: float = 10.0,
         max_steps: int = 10000,
         on_step=None,
+        backend: str = "monitoring",
+        pool=None,
+        interactive: bool = True,
+        stats: bool = False,
+        profile: bool = False,
+        scope=None,
+        sample_after: int = None,
+        sample_target: int = 100000,
     ):
         self.code = code
         self.inputs = inputs[:] if inputs else []
         self.timeout = timeout
         self.max_steps = max_steps
         self.on_step = on_step
+        self.backend = backend
+        self.pool = pool
+        # without a terminal to type into, input() past the scripted
+        # inputs raises EOFError instead of waiting
+        self.interactive = interactive
+        # record the tracer's own phase timings (result["stats"])
+        self.stats = stats
+        # time each line and function (result["profile"])
+        self.profile = profile
+        # what to record (core.parser.TraceScope); by default it comes
+        # from the code's "# visualize: off/on" pragmas
+        self.scope = scope
+        # sampling mode (see core.tracer.Sampler): after `sample_after`
+        # events only some line steps are kept, aiming at `sample_target`
+        self.sample_after = sample_after
+        self.sample_target = sample_target
         self.tracer = None
         
+        # Completion, stop, input waits and timeouts are all signalled
+        # through this one condition.
+        self._signal = threading.Condition()
+        self._stop_event = threading.Event()
+        self._finished = False
+        self._input_time = 0.0  # seconds spent blocked in input()
+
         # dynamic input handling
         self.waiting_for_input = False
-        self._input_event = threading.Event()
+        self._input_ready = False
         self._current_input_value = ""
         self._run_thread = None
+        self._worker = None
 
     def provide_input(self, value: str):
-        self._current_input_value = value
-        self._input_event.set()
+        with self._signal:
+            self._current_input_value = value
+            self._input_ready = True
+            self._signal.notify_all()
 
     def stop(self):
-        if hasattr(self, '_stop_event'):
+        with self._signal:
             self._stop_event.set()
-        if getattr(self, 'tracer', None):
-            self.tracer.limit_reached = True
-        if getattr(self, 'waiting_for_input', False):
-            self.provide_input("") # Unblock the wait to let it crash out
+            if self.tracer is not None:
+                self.tracer.limit_reached = True
+            if self.waiting_for_input:
+                self.provide_input("") # Unblock the wait to let it crash out
+            self._signal.notify_all()
+        if self._worker is not None:
+            self._worker.messages.put(("stopped",))  # wake the result loop
+
+    def close(self):
+        """Release the run's spilled steps once they are no longer read."""
+        if self.tracer is not None:
+            self.tracer.trace_data.close()
+
+    def _create_stdout(self):
+        return io.StringIO()
+
+    def _wait_for_input(self):
+        with self._signal:
+            self._input_ready = False
+            self.waiting_for_input = True
+            self._signal.notify_all()
+        started = time.monotonic()
+        try:
+            return self._receive_input()
+        finally:
+            with self._signal:
+                self._input_time += time.monotonic() - started
+                self.waiting_for_input = False
+                self._signal.notify_all()
+
+    def _receive_input(self):
+        # Block and wait for dynamic UI input
+        with self._signal:
+            self._signal.wait_for(
+                lambda: self._input_ready or self._stop_event.is_set(),
+                timeout=self.timeout,
+            )
+            return self._current_input_value
+
+    def _active_time(self, started):
+        """Seconds since `started` not spent blocked in input()."""
+        return time.monotonic() - started - self._input_time
 
     def execute(self):
         CodeParser.parse(self.code)
 
-        stdout_capture = io.StringIO()
-        self._stop_event = threading.Event()
-        self.tracer = Tracer(
+        if self.pool is not None:
+            return self._execute_in_worker()
+
+        scope = self.scope if self.scope is not None else CodeParser.trace_scope(self.code)
+
+        stdout_capture = self._create_stdout()
+        tracer_cls = Tracer
+        if self.backend == "monitoring" and MonitoringTracer.is_available():
+            tracer_cls = MonitoringTracer
+        self.tracer = tracer_cls(
             stdout_buffer=stdout_capture, 
             max_steps=self.max_steps, 
             stop_event=self._stop_event,
-            on_step=self.on_step
+            on_step=self.on_step,
+            stats=self.stats,
+            profile=self.profile,
+            scope=scope,
+            global_writes=CodeParser.global_writes(self.code),
+            sample_after=self.sample_after,
+            sample_target=self.sample_target,
         )
         exec_globals = {}
 
@@ -67,15 +153,10 @@ class Executor:
             if self.inputs:
                 value = str(self.inputs.pop(0))
                 stdout_capture.write(value + "\n")
+            elif not self.interactive:
+                raise EOFError("EOF when reading a line")
             else:
-                # Block and wait for dynamic UI input
-                self.waiting_for_input = True
-                self._input_event.clear()
-                # Wait for up to timeout seconds minus some buffer for the input
-                self._input_event.wait(timeout=self.timeout)
-                value = self._current_input_value
-                self.waiting_for_input = False
-                
+                value = self._wait_for_input()
                 stdout_capture.write("\n")
                 
             if self.tracer:
@@ -87,45 +168,150 @@ class Executor:
 
         result = {"error": None}
 
+        code_obj = compile(self.code, "<string>", "exec")
+
         def run_code():
             try:
                 with contextlib.redirect_stdout(stdout_capture):
-                    sys.settrace(self.tracer.trace)
+                    self.tracer.start(code_obj)
                     try:
-                        exec(self.code, exec_globals)
+                        exec(code_obj, exec_globals)
                     finally:
-                        sys.settrace(None)
+                        self.tracer.stop()
             except ExecutionLimitReached:
                 pass
             except Exception as e:
                 result["error"] = f"{type(e).__name__}: {str(e)}"
+            finally:
+                with self._signal:
+                    self._finished = True
+                    self._signal.notify_all()
 
         self._run_thread = threading.Thread(target=run_code)
+        started = time.monotonic()
         self._run_thread.start()
-        
-        start_time = threading.Timer(0, lambda: None) # mock timer
-        
-        exec_time = 0.0
-        while self._run_thread.is_alive():
-            time.sleep(0.1)
-            
-            if hasattr(self, '_stop_event') and self._stop_event.is_set():
-                break
-                
-            if not self.waiting_for_input:
-                exec_time += 0.1
-                if exec_time >= self.timeout:
+
+        with self._signal:
+            while not self._finished and not self._stop_event.is_set():
+                if self.waiting_for_input:
+                    # the clock is paused until input() returns
+                    self._signal.wait()
+                    continue
+                remaining = self.timeout - self._active_time(started)
+                if remaining <= 0:
                     break
+                self._signal.wait(remaining)
         
+        timed_out = not self._finished and not self._stop_event.is_set()
+        if not self._finished:
+            # make the traced thread bail out at its next event
+            self.tracer.limit_reached = True
+
         self._run_thread.join(timeout=1.0)
         
         if self._run_thread.is_alive():
-            self.tracer.limit_reached = True
-            result["error"] = "ExecutionTimeout: Thread killed after timeout."
+            result["error"] = "ExecutionTimeout: Thread abandoned after timeout."
+        elif timed_out:
+            result["error"] = f"ExecutionTimeout: Stopped after {self.timeout:g} seconds."
 
         return {
             "steps": self.tracer.get_trace(),
             "counts": self.tracer.line_counts,
+            "profile": self.tracer.get_profile(),
+            "stats": self.tracer.stats(),
             "limit_reached": self.tracer.limit_reached,
             "error": result["error"],
         }
+
+    def _execute_in_worker(self):
+        """Run the program in a pooled worker process.
+
+        Steps are streamed back and adopted by a local Tracer that only
+        mirrors the worker's trace, so the rest of the app can keep using
+        ``executor.tracer`` as in threaded mode. A worker that outlives the
+        timeout is killed and replaced.
+        """
+        self.tracer = Tracer(
+            stdout_buffer=io.StringIO(),
+            max_steps=self.max_steps,
+            on_step=self.on_step,
+        )
+        worker = self.pool.acquire()
+        self._worker = worker
+        worker.send(
+            ("run", self.code, self.inputs, self.timeout, self.max_steps, self.backend,
+             self.stats, self.profile, self.scope, self.sample_after, self.sample_target)
+        )
+
+        result = {
+            "error": None,
+            "counts": None,
+            "profile": None,
+            "stats": None,
+            "limit_reached": False,
+        }
+        synced = 0  # stdout characters received from the worker
+        started = time.monotonic()
+        finished = False
+        reusable = False
+
+        while not finished:
+            remaining = self.timeout - self._active_time(started)
+            try:
+                msg = worker.messages.get(timeout=max(0.0, remaining))
+            except queue.Empty:
+                result["error"] = "ExecutionTimeout: Worker killed after timeout."
+                break
+
+            kind = msg[0]
+            if kind == "step":
+                _, state, chunk = msg
+                if chunk:
+                    self.tracer.append_stdout(chunk)
+                    synced += len(chunk)
+                self.tracer.adopt(state)
+            elif kind == "input":
+                value = self._wait_for_input()
+                # The worker echoes the value itself; drop the local echo
+                # typed into the terminal while we were waiting.
+                echoed = self.tracer.stdout_buffer.tell() - synced
+                if echoed > 0:
+                    self.tracer.erase_stdout(echoed)
+                worker.send(("input", value))
+            elif kind == "done":
+                _, counts, profile, stats, limit_reached, error, chunk, reusable = msg
+                if chunk:
+                    self.tracer.append_stdout(chunk)
+                result.update(
+                    counts=counts, profile=profile, stats=stats, limit_reached=limit_reached, error=error
+                )
+                finished = True
+            elif kind == "stopped":
+                result["limit_reached"] = True
+                break
+            elif kind == "exit":
+                result["error"] = "WorkerCrashed: Worker process exited unexpectedly."
+                break
+
+        self._worker = None
+        if not finished:
+            self.tracer.limit_reached = True
+            result["limit_reached"] = True
+        if reusable:
+            self.pool.release(worker)
+        else:
+            self.pool.discard(worker)
+
+        if result["counts"] is not None:
+            self.tracer.line_counts = result["counts"]
+        if result["profile"] is not None:
+            self.tracer.profile = result["profile"]
+        return {
+            "steps": self.tracer.get_trace(),
+            "counts": self.tracer.line_counts,
+            "profile": self.tracer.get_profile(),
+            # the worker's tracer did the work; this one only mirrors it
+            "stats": result["stats"],
+            "limit_reached": result["limit_reached"],
+            "error": result["error"],
+        }
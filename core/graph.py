@@ -1,16 +1,138 @@
+from collections import OrderedDict, defaultdict
+
+from kivy.clock import Clock
 from kivy.uix.stencilview import StencilView
 from kivy.uix.widget import Widget
-from kivy.graphics import Color, Line, Rectangle
+from kivy.graphics import Canvas, Color, Line, PopMatrix, PushMatrix, Rectangle, Translate
 from kivy.core.text import Label as CoreLabel
 from kivy.utils import get_color_from_hex
 
 
+# Memory budget for rasterized labels (RGBA bytes)
+TEXTURE_CACHE_BYTES = 16 * 1024 * 1024
+
+# Extra distance around the visible area that is still drawn, so short
+# scrolls do not expose undrawn boxes before the next frame
+CULL_MARGIN = 200
+
+
+class TextureCache:
+    """LRU cache of rasterized label textures keyed by (text, font size, bold)."""
+
+    def __init__(self, max_bytes=TEXTURE_CACHE_BYTES, font_name="RobotoMono-Regular"):
+        self.max_bytes = max_bytes
+        self.font_name = font_name
+        self._textures = OrderedDict()
+        self.size_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, text, size, bold=False):
+        key = (text, size, bold)
+        texture = self._textures.get(key)
+        if texture is not None:
+            self._textures.move_to_end(key)
+            self.hits += 1
+            return texture
+
+        self.misses += 1
+        label = CoreLabel(text=text, font_name=self.font_name, font_size=size, bold=bold)
+        label.refresh()
+        texture = label.texture
+        self._textures[key] = texture
+        self.size_bytes += self._texture_bytes(texture)
+        self._evict()
+        return texture
+
+    def _texture_bytes(self, texture):
+        w, h = texture.size
+        return w * h * 4
+
+    def _evict(self):
+        # always keep the most recent texture, even if it alone is over budget
+        while self.size_bytes > self.max_bytes and len(self._textures) > 1:
+            _, texture = self._textures.popitem(last=False)
+            self.size_bytes -= self._texture_bytes(texture)
+            self.evictions += 1
+
+    def clear(self):
+        self._textures.clear()
+        self.size_bytes = 0
+
+    def stats(self):
+        return {
+            "entries": len(self._textures),
+            "bytes": self.size_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
+
+
+def _shallow(value):
+    # Nested heap objects are drawn as pointers, so only their ref matters
+    if isinstance(value, dict) and "__ref__" in value:
+        return ("__ref__", value["__ref__"])
+    return value
+
+
+def _shallow_value(value):
+    if isinstance(value, list):
+        return [_shallow(v) for v in value]
+    if isinstance(value, dict):
+        return {k: _shallow(v) for k, v in value.items()}
+    return value
+
+
+class SpatialIndex:
+    """Uniform grid over layout rectangles for sub-linear visibility queries."""
+
+    def __init__(self, cell=256):
+        self.cell = cell
+        self._cells = defaultdict(list)
+
+    def _span(self, x, y, w, h):
+        c = self.cell
+        return (range(int(x // c), int((x + w) // c) + 1),
+                range(int(y // c), int((y + h) // c) + 1))
+
+    def insert(self, key, rect):
+        cols, rows = self._span(*rect)
+        for i in cols:
+            for j in rows:
+                self._cells[(i, j)].append((key, rect))
+
+    def query(self, rect):
+        x, y, w, h = rect
+        found = set()
+        cols, rows = self._span(*rect)
+        for i in cols:
+            for j in rows:
+                for key, (rx, ry, rw, rh) in self._cells.get((i, j), ()):
+                    if key in found:
+                        continue
+                    if rx <= x + w and x <= rx + rw and ry <= y + h and y <= ry + rh:
+                        found.add(key)
+        return found
+
+
+class _RetainedGroup:
+    """A canvas group kept across updates together with what it was drawn from."""
+
+    def __init__(self):
+        self.group = Canvas()
+        self.translate = None
+        self.signature = None
+
+
 class DataGraph(StencilView):
     def __init__(self, **kwargs):
         super().__init__(**kwargs)
         self.bind(pos=self.update_canvas, size=self.update_canvas)
         self.frame_data = {}
         self.heap_data = {}
+        self.texture_cache = TextureCache()
 
         # Colors
         self.c_bg = get_color_from_hex("#1e1e1e")
@@ -26,21 +148,36 @@ class DataGraph(StencilView):
         self.c_pointer = get_color_from_hex("#58a6ff")
         self.c_null = get_color_from_hex("#858585")
 
-    def build_graph(self, local_vars, global_vars, prev_local_vars=None, prev_global_vars=None):
+        # Retained instruction groups, one per frame / heap ref and per pointer owner
+        self._box_groups = {}
+        self._pointer_groups = {}
+        with self.canvas:
+            Color(*self.c_bg)
+            self._bg = Rectangle(pos=self.pos, size=self.size)
+        self._box_layer = Canvas()
+        self._pointer_layer = Canvas()
+        self.canvas.add(self._box_layer)
+        self.canvas.add(self._pointer_layer)
+        self.changed_vars = {}
+
+        # Last laid-out graph, reused to redraw the visible part on scroll;
+        # the index and pointer curves are rebuilt only when the geometry
+        # (box positions, sizes and pointer anchors) changes
+        self._metrics = None
+        self._index = None
+        self._geometry = None
+        self._pointers = []
+        self._trigger_cull = Clock.create_trigger(self._redraw_visible)
+
+    def build_graph(self, local_vars, global_vars, changed_locals=None, changed_globals=None):
         self.frame_data = {"Globals": global_vars, "Locals": local_vars}
         self.heap_data = {}
         
-        self.changed_vars = {"Globals": set(), "Locals": set()}
-        
-        if prev_global_vars is not None:
-            for k, v in global_vars.items():
-                if k not in prev_global_vars or prev_global_vars[k] != v:
-                    self.changed_vars["Globals"].add(k)
-                    
-        if prev_local_vars is not None:
-            for k, v in local_vars.items():
-                if k not in prev_local_vars or prev_local_vars[k] != v:
-                    self.changed_vars["Locals"].add(k)
+        # Changed names come straight from the tracer's per-step delta
+        self.changed_vars = {
+            "Globals": set(changed_globals or ()),
+            "Locals": set(changed_locals or ()),
+        }
         
         self._extract_heap(local_vars)
         self._extract_heap(global_vars)
@@ -69,6 +206,8 @@ class DataGraph(StencilView):
     def on_parent(self, widget, parent):
         if parent:
             parent.bind(size=self._on_parent_size)
+            if hasattr(parent, "scroll_y"):
+                parent.bind(scroll_x=self._trigger_cull, scroll_y=self._trigger_cull)
             
     def _on_parent_size(self, instance, size):
         self.update_canvas()
@@ -78,12 +217,14 @@ class DataGraph(StencilView):
             return
             
         self._updating_canvas = True
-        self.canvas.clear()
         
         if not self.frame_data and not self.heap_data:
+            self._metrics = self._index = self._geometry = None
+            self._sync_groups({}, {})
             self._updating_canvas = False
             return
 
+        # Layout is computed once relative to y=0 and shifted to the top edge
         metrics = self._calculate_layout(base_y=0)
         
         max_w = 0
@@ -114,19 +255,83 @@ class DataGraph(StencilView):
             self._updating_canvas = False
             return
 
-        with self.canvas:
-            Color(*self.c_bg)
-            Rectangle(pos=self.pos, size=self.size)
+        self._bg.pos = self.pos
+        self._bg.size = self.size
 
-        metrics = self._calculate_layout(base_y=self.top)
+        for m in metrics["frames"].values():
+            m["y"] += self.top
+        for m in metrics["heap"].values():
+            m["y"] += self.top
+
+        self._metrics = metrics
+        geometry = self._geometry_of(metrics)
+        if geometry != self._geometry:
+            self._geometry = geometry
+            self._index, self._pointers = self._build_index(metrics)
         self._draw_graph(metrics)
         self._updating_canvas = False
 
+    def _redraw_visible(self, *args):
+        if self._metrics is not None:
+            self._draw_graph(self._metrics)
+
+    def _visible_rect(self):
+        # ScrollView keeps its child at (0, 0) and scrolls it with a translate
+        sv = self.parent
+        if sv is None or not hasattr(sv, "scroll_y"):
+            x, y, w, h = self.x, self.y, self.width, self.height
+        else:
+            x = self.x + sv.scroll_x * max(0, self.width - sv.width)
+            y = self.y + sv.scroll_y * max(0, self.height - sv.height)
+            w, h = sv.width, sv.height
+        return (x - CULL_MARGIN, y - CULL_MARGIN, w + 2 * CULL_MARGIN, h + 2 * CULL_MARGIN)
+
+    @staticmethod
+    def _geometry_of(metrics):
+        return tuple(
+            (kind, key, m["x"], m["y"], m["w"], m["h"], tuple(m["anchors"]))
+            for kind, boxes in (("frame", metrics["frames"]), ("heap", metrics["heap"]))
+            for key, m in boxes.items()
+        )
+
+    def _build_index(self, metrics):
+        """Spatial index of boxes and pointers, and the pointer curves as
+        (owner, curve) pairs; a pointer's index key is its position."""
+        index = SpatialIndex()
+        for name, m in metrics["frames"].items():
+            index.insert(("frame", name), (m["x"], m["y"], m["w"], m["h"]))
+        for ref_id, m in metrics["heap"].items():
+            index.insert(("heap", ref_id), (m["x"], m["y"], m["w"], m["h"]))
+
+        pointers = []
+        for kind, boxes in (("frame", metrics["frames"]), ("heap", metrics["heap"])):
+            for key, m in boxes.items():
+                for start_x, start_y, end_ref in m["anchors"]:
+                    target = metrics["heap"].get(end_ref)
+                    if not target:
+                        continue
+                    # Point to middle left edge of the target bounding box
+                    curve = (m["x"] + start_x, m["y"] + start_y,
+                             target["x"], target["y"] + (target["h"] / 2))
+                    pointers.append(((kind, key), curve))
+
+        for i, (owner, (sx, sy, ex, ey)) in enumerate(pointers):
+            # A bezier stays inside the hull of its control points
+            xs = (sx, sx + 120, ex - 120, ex)
+            index.insert(("pointer", i), (min(xs), min(sy, ey), max(xs) - min(xs), abs(ey - sy)))
+        return index, pointers
+
+    def _sync_groups(self, boxes, pointers):
+        """Drops retained groups that disappeared or scrolled out of view."""
+        for key in [k for k in self._box_groups if k not in boxes]:
+            self._box_layer.remove(self._box_groups.pop(key).group)
+        for key in [k for k in self._pointer_groups if k not in pointers]:
+            self._pointer_layer.remove(self._pointer_groups.pop(key).group)
+
     def _calculate_layout(self, base_y):
         metrics = {
             "frames": {},
-            "heap": {},
-            "pointers": []
+            "heap": {}
         }
         
         # Constants
@@ -151,13 +356,24 @@ class DataGraph(StencilView):
             req_w = 20 + max_k_len * 11 + 40 + max_v_len * 11 + 20
             max_w = max(FRAME_W, req_w, title_w)
             
+            val_x_offset = 20 + max_k_len * 11 + 40
+
+            # Pointer start points in box-local coordinates
+            anchors = []
+            var_y = frame_h - 85
+            for v in frame_vars.values():
+                if isinstance(v, dict) and "__ref__" in v:
+                    anchors.append((val_x_offset + 50, var_y + 15, v["__ref__"]))
+                var_y -= ROW_H
+            
             metrics["frames"][frame_name] = {
                 "x": self.x + PADDING,
                 "y": cur_y - frame_h,
                 "w": max_w,
                 "h": frame_h,
                 "vars": frame_vars,
-                "val_x_offset": 20 + max_k_len * 11 + 40
+                "val_x_offset": val_x_offset,
+                "anchors": anchors
             }
             cur_y -= frame_h + PADDING
 
@@ -199,6 +415,22 @@ class DataGraph(StencilView):
             else:
                  h += ROW_H
                  w = max(HEAP_MIN_W, title_w, 20 + len(str(val)) * 11 + 20)
+
+            # Pointer start points in box-local coordinates
+            anchors = []
+            content_y = h - 45 - 38
+            if obj_type in ("list", "tuple", "set") and isinstance(val, list):
+                slot_w = w / max(1, len(val))
+                for i, item in enumerate(val):
+                    if isinstance(item, dict) and "__ref__" in item:
+                        anchors.append((i * slot_w + slot_w/2 + 2, content_y + 15, item["__ref__"]))
+            elif obj_type == "dict" and isinstance(val, dict):
+                for k, v in val.items():
+                    if k == "__truncated__":
+                        continue
+                    if isinstance(v, dict) and "__ref__" in v:
+                        anchors.append((val_x_offset + 20, content_y + 15, v["__ref__"]))
+                    content_y -= ROW_H
             
             metrics["heap"][ref_id] = {
                 "x": HEAP_START_X,
@@ -207,23 +439,82 @@ class DataGraph(StencilView):
                 "h": h,
                 "obj": obj,
                 "val_x_offset": val_x_offset,
-                "k_box_w": k_box_w
+                "k_box_w": k_box_w,
+                "anchors": anchors
             }
             cur_y -= h + PADDING
             
         return metrics
 
     def _draw_graph(self, metrics):
-        with self.canvas:
-            for frame_name, frame_metrics in metrics["frames"].items():
-                self._draw_frame(frame_name, frame_metrics, metrics)
-                
-            for ref_id, heap_metrics in metrics["heap"].items():
-                self._draw_heap_object(ref_id, heap_metrics, metrics)
-                
-            self._draw_pointers(metrics)
+        # only what the grid query returns is touched, however big the graph
+        boxes = {}
+        visible_pointers = []
+        for key in self._index.query(self._visible_rect()):
+            kind, name = key
+            if kind == "frame":
+                m = metrics["frames"][name]
+                signature = (m["w"], m["h"], m["val_x_offset"],
+                             [(k, _shallow(v)) for k, v in m["vars"].items()],
+                             self.changed_vars.get(name, set()))
+                boxes[key] = self._retain_box(
+                    key, m, signature, lambda local, name=name: self._draw_frame(name, local))
+            elif kind == "heap":
+                m = metrics["heap"][name]
+                signature = (m["w"], m["h"], m["obj"].get("__type__"), _shallow_value(m["obj"].get("value")))
+                boxes[key] = self._retain_box(
+                    key, m, signature, lambda local, ref_id=name: self._draw_heap_object(ref_id, local))
+            else:
+                visible_pointers.append(name)
+
+        curves_by_owner = defaultdict(list)
+        for i in sorted(visible_pointers):
+            owner, curve = self._pointers[i]
+            curves_by_owner[owner].append(curve)
+
+        pointers = {}
+        for owner, curves in curves_by_owner.items():
+            pointers[owner] = self._retain_pointers(owner, tuple(curves))
+
+        self._sync_groups(boxes, pointers)
+
+    def _retain_box(self, key, m, signature, draw):
+        """Rebuilds a box group only if its content changed, otherwise moves it."""
+        box = self._box_groups.get(key)
+        if box is None:
+            box = _RetainedGroup()
+            self._box_groups[key] = box
+            self._box_layer.add(box.group)
+
+        if box.signature != signature:
+            box.signature = signature
+            box.group.clear()
+            box.group.add(PushMatrix())
+            box.translate = Translate(m["x"], m["y"])
+            box.group.add(box.translate)
+            with box.group:
+                # Draw in box-local coordinates so moving is a single translate
+                draw(dict(m, x=0, y=0))
+            box.group.add(PopMatrix())
+        elif box.translate.xy != (m["x"], m["y"]):
+            box.translate.xy = (m["x"], m["y"])
+        return box
 
-    def _draw_frame(self, name, m, all_metrics):
+    def _retain_pointers(self, key, curves):
+        entry = self._pointer_groups.get(key)
+        if entry is None:
+            entry = _RetainedGroup()
+            self._pointer_groups[key] = entry
+            self._pointer_layer.add(entry.group)
+
+        if entry.signature != curves:
+            entry.signature = curves
+            entry.group.clear()
+            with entry.group:
+                self._draw_pointers(curves)
+        return entry
+
+    def _draw_frame(self, name, m):
         # Frame Box
         Color(*self.c_frame_bg)
         Rectangle(pos=(m["x"], m["y"]), size=(m["w"], m["h"]))
@@ -248,18 +539,11 @@ class DataGraph(StencilView):
             # Var Name
             self._draw_text(var_name, m["x"] + 20, var_y, self.c_text, size=18)
             
-            # Pointer Connection Point calculation
+            # Value column
             val_x = m["x"] + m.get("val_x_offset", m["w"] / 2)
             
             if isinstance(var_val, dict) and "__ref__" in var_val:
-                ref_id = var_val["__ref__"]
                 self._draw_text("   \u25CF", val_x, var_y - 2, self.c_pointer, size=24) 
-                
-                if ref_id in all_metrics["heap"]:
-                    all_metrics["pointers"].append({
-                        "start": (val_x + 50, var_y + 15),
-                        "end_ref": ref_id
-                    })
             else:
                 val_str = str(var_val)
                 c = self.c_string if isinstance(var_val, str) else self.c_number
@@ -268,7 +552,7 @@ class DataGraph(StencilView):
                 
             var_y -= 45
 
-    def _draw_heap_object(self, ref_id, m, all_metrics):
+    def _draw_heap_object(self, ref_id, m):
         obj = m["obj"]
         obj_type = obj.get("__type__", "object")
         val = obj.get("value")
@@ -318,11 +602,6 @@ class DataGraph(StencilView):
                 elif isinstance(item, dict) and "__ref__" in item:
                     # Pointer from array slot
                     self._draw_text("\u25CF", slot_x + slot_w/2 - 8, content_y, self.c_pointer, size=24)
-                    if item["__ref__"] in all_metrics["heap"]:
-                        all_metrics["pointers"].append({
-                            "start": (slot_x + slot_w/2 + 2, content_y + 15),
-                            "end_ref": item["__ref__"]
-                        })
                 else:
                     v_str = str(item)
                     c = self.c_string if isinstance(item, str) else self.c_number
@@ -346,11 +625,6 @@ class DataGraph(StencilView):
                 # Dict value
                 if isinstance(v, dict) and "__ref__" in v:
                     self._draw_text("\u25CF", m["x"] + val_x + 10, content_y, self.c_pointer, size=24)
-                    if v["__ref__"] in all_metrics["heap"]:
-                        all_metrics["pointers"].append({
-                            "start": (m["x"] + val_x + 20, content_y + 15),
-                            "end_ref": v["__ref__"]
-                        })
                 else:
                     v_str = str(v)
                     c = self.c_string if isinstance(v, str) else self.c_number
@@ -366,31 +640,21 @@ class DataGraph(StencilView):
             # Render simple value representation
             self._draw_text(str(val), m["x"] + 20, content_y, self.c_number, size=18)
 
-    def _draw_pointers(self, metrics):
-        for p in metrics["pointers"]:
-            start_x, start_y = p["start"]
-            target = metrics["heap"].get(p["end_ref"])
+    def _draw_pointers(self, curves):
+        for start_x, start_y, end_x, end_y in curves:
+            cp1_x = start_x + 120
+            cp1_y = start_y
+            cp2_x = end_x - 120
+            cp2_y = end_y
             
-            if target:
-                end_x = target["x"]
-                # Point to middle left edge of the target bounding box
-                end_y = target["y"] + (target["h"] / 2)
-                
-                cp1_x = start_x + 120
-                cp1_y = start_y
-                cp2_x = end_x - 120
-                cp2_y = end_y
-                
-                Color(*self.c_pointer)
-                # Ensure the line pops more by drawing a dark background line slightly thicker first
-                Color(0.1, 0.1, 0.1, 0.8)
-                Line(bezier=(start_x, start_y, cp1_x, cp1_y, cp2_x, cp2_y, end_x, end_y), width=2.5)
-                
-                Color(*self.c_pointer)
-                Line(bezier=(start_x, start_y, cp1_x, cp1_y, cp2_x, cp2_y, end_x, end_y), width=1.5)
+            # Ensure the line pops more by drawing a dark background line slightly thicker first
+            Color(0.1, 0.1, 0.1, 0.8)
+            Line(bezier=(start_x, start_y, cp1_x, cp1_y, cp2_x, cp2_y, end_x, end_y), width=2.5)
+            
+            Color(*self.c_pointer)
+            Line(bezier=(start_x, start_y, cp1_x, cp1_y, cp2_x, cp2_y, end_x, end_y), width=1.5)
 
     def _draw_text(self, text, x, y, color, bold=False, size=12):
-        label = CoreLabel(text=str(text), font_name="RobotoMono-Regular", font_size=size, bold=bold)
-        label.refresh()
+        texture = self.texture_cache.get(str(text), size, bold)
         Color(*color)
-        Rectangle(pos=(x, y), size=label.texture.size, texture=label.texture)
+        Rectangle(pos=(x, y), size=texture.size, texture=texture)
@@ -1,4 +1,51 @@
 import ast
+import dis
+import io
+import re
+import tokenize
+import types
+
+# "# visualize: off" / "# visualize: on"
+PRAGMA = re.compile(r"#\s*visualize\s*:\s*(on|off)\b", re.IGNORECASE)
+
+# names (functions, attributes, modules) through which code can reach a
+# module's globals dict, run code against it, or look any of these up by a
+# computed name
+DYNAMIC_GLOBALS = frozenset((
+    "globals", "locals", "vars", "exec", "eval", "compile", "__import__",
+    "getattr", "setattr", "delattr", "f_globals", "__globals__", "__dict__",
+    "__builtins__", "modules", "__main__", "_getframe", "currentframe",
+))
+
+# opcodes that rebind a name in the module's globals
+GLOBAL_STORES = frozenset((dis.opmap["STORE_GLOBAL"], dis.opmap["DELETE_GLOBAL"]))
+
+
+class TraceScope:
+    """Which parts of a program the tracer records.
+
+    A step is recorded only when its function is traced (every function,
+    or just `include_functions` if given, minus `exclude_functions`; the
+    module itself is ``"<module>"``) and its line is not in
+    `exclude_lines`. Excluded code still has its lines counted when
+    `count_excluded` is set, which costs an event each; otherwise it runs
+    without any tracing at all.
+    """
+
+    def __init__(self, exclude_lines=(), include_functions=None, exclude_functions=(),
+                 count_excluded=True):
+        self.exclude_lines = frozenset(exclude_lines)
+        self.include_functions = None if include_functions is None else frozenset(include_functions)
+        self.exclude_functions = frozenset(exclude_functions)
+        self.count_excluded = count_excluded
+
+    def traces_function(self, name):
+        if name in self.exclude_functions:
+            return False
+        return self.include_functions is None or name in self.include_functions
+
+    def traces(self, name, line):
+        return line not in self.exclude_lines and self.traces_function(name)
 
 
 class CodeParser:
@@ -31,3 +78,70 @@ class CodeParser:
             warnings.append(f"Critical: Syntax Error at line {e.lineno}")
 
         return warnings
+
+    @staticmethod
+    def pragma_lines(code: str):
+        """Lines switched off by ``# visualize: off`` ... ``# visualize: on``.
+
+        The lines after an "off" comment are excluded up to the line of the
+        next "on" comment (or the end of the code).
+        """
+        excluded = set()
+        off_after = None
+        tokens = tokenize.generate_tokens(io.StringIO(code).readline)
+        try:
+            for tok in tokens:
+                if tok.type != tokenize.COMMENT:
+                    continue
+                match = PRAGMA.match(tok.string)
+                if match is None:
+                    continue
+                line = tok.start[0]
+                if match.group(1).lower() == "off":
+                    if off_after is None:
+                        off_after = line
+                elif off_after is not None:
+                    excluded.update(range(off_after + 1, line))
+                    off_after = None
+        except (tokenize.TokenError, SyntaxError):
+            pass  # parse() reports broken code
+        if off_after is not None:
+            excluded.update(range(off_after + 1, len(code.splitlines()) + 1))
+        return excluded
+
+    @staticmethod
+    def global_writes(code: str):
+        """Names code outside the module body can rebind in the module's
+        globals: the STORE_GLOBAL / DELETE_GLOBAL targets of every nested
+        code object (``global`` declarations, but also walrus targets in
+        generator expressions and the like).
+
+        None when the code can get at the globals dict itself (globals(),
+        exec, a frame's f_globals, getattr, ...), so any global may change
+        anywhere.
+        """
+        try:
+            module = compile(code, "<string>", "exec")
+        except (SyntaxError, ValueError):
+            return None
+        names = set()
+        pending = [module]
+        while pending:
+            co = pending.pop()
+            if not DYNAMIC_GLOBALS.isdisjoint(co.co_names):
+                return None
+            if co is not module:
+                for instr in dis.get_instructions(co):
+                    if instr.opcode in GLOBAL_STORES:
+                        names.add(instr.argval)
+            pending.extend(c for c in co.co_consts if isinstance(c, types.CodeType))
+        return frozenset(names)
+
+    @staticmethod
+    def trace_scope(code: str, include_functions=None, exclude_functions=(), count_excluded=True):
+        """TraceScope from the code's pragmas and the given function sets,
+        or None when everything is traced."""
+        lines = CodeParser.pragma_lines(code)
+        if not lines and include_functions is None and not exclude_functions:
+            return None
+        return TraceScope(lines, include_functions, exclude_functions, count_excluded)
@@ -0,0 +1,189 @@
+"""Per-line and per-function timings of a traced program.
+
+The tracer calls pause() when a trace event arrives and resume() when it
+hands control back to the program, so only the time the program itself
+ran between two events is measured; the tracer's own work in between
+(serializing, storing, streaming the step) is left out. What remains of
+the tracer's cost is delivering the event to it, which is about the same
+for every event: the shortest interval seen so far is taken as that cost
+and subtracted from each interval. The time left goes to the line that
+was running:
+
+    self   time spent on the line itself, including untraced code it calls
+           (builtins, libraries), but not traced callees
+    total  from the line starting until the next line of the same frame,
+           callees included
+    cpu    self time as thread CPU time, so a line blocked in input() or
+           sleep() shows wall time but no CPU
+
+Functions (keyed by qualified name) get the same three figures plus a call
+count. As in cProfile, the total time of recursive functions (and lines) is
+only counted for the outermost active call.
+"""
+
+import time
+
+_clock = time.perf_counter_ns
+_cpu_clock = time.thread_time_ns
+
+
+class _Frame:
+    __slots__ = ("frame_id", "func", "line", "line_start", "call_start")
+
+    def __init__(self, frame_id, func, line, now):
+        self.frame_id = frame_id
+        self.func = func
+        self.line = line
+        self.line_start = now
+        self.call_start = now
+
+
+class LineProfiler:
+    def __init__(self):
+        # line -> [self, total, cpu]; qualname -> [calls, self, total, cpu]
+        self.lines = {}
+        self.functions = {}
+        self.elapsed = 0  # program time so far (ns), the clock totals use
+        self._frames = []
+        self._active_lines = {}
+        self._active_funcs = {}
+        self._resumed = None
+        self._resumed_cpu = 0
+        # shortest (wall, cpu) intervals so far: the cost of an event
+        self._floor = None
+        self._cpu_floor = None
+
+    def pause(self, frame, event):
+        """A trace event arrived: charge the time since resume()."""
+        now = _clock()
+        cpu = _cpu_clock()
+        if self._resumed is not None:
+            wall = now - self._resumed
+            cpu -= self._resumed_cpu
+            if self._floor is None:
+                self._floor, self._cpu_floor = wall, cpu
+                self._charge(wall, min(wall, cpu))
+            else:
+                # corrected by the floor of the earlier events, so a long
+                # first interval is not subtracted from the next one
+                corrected = max(0, wall - self._floor)
+                self._charge(corrected, min(corrected, max(0, cpu - self._cpu_floor)))
+                self._floor = min(self._floor, wall)
+                self._cpu_floor = min(self._cpu_floor, cpu)
+            self._resumed = None
+
+        if event == "call":
+            self._push(frame)
+            return
+        if event not in ("line", "return"):
+            return
+        top = self._sync(frame)
+        if event == "line":
+            self._end_line(top)
+            self._start_line(top, frame.f_lineno)
+        else:
+            self._pop()
+
+    def resume(self):
+        """Control goes back to the program."""
+        # read in the opposite order to pause(), so the wall interval
+        # does not include the CPU clock (a system call)
+        self._resumed_cpu = _cpu_clock()
+        self._resumed = _clock()
+
+    def finish(self):
+        """The program stopped (finished, raised or was cut off)."""
+        if self._resumed is not None:
+            wall = _clock() - self._resumed
+            self._charge(wall, min(wall, _cpu_clock() - self._resumed_cpu))
+            self._resumed = None
+        while self._frames:
+            self._pop()
+
+    def _charge(self, wall, cpu):
+        self.elapsed += wall
+        if not self._frames:
+            return
+        top = self._frames[-1]
+        line = self.lines.get(top.line)
+        if line is None:
+            line = self.lines[top.line] = [0, 0, 0]
+        line[0] += wall
+        line[2] += cpu
+        func = self.functions[top.func]
+        func[1] += wall
+        func[3] += cpu
+
+    def _push(self, frame):
+        code = frame.f_code
+        func = code.co_qualname
+        entry = _Frame(id(frame), func, frame.f_lineno, self.elapsed)
+        self._frames.append(entry)
+        stats = self.functions.get(func)
+        if stats is None:
+            stats = self.functions[func] = [0, 0, 0, 0]
+        stats[0] += 1
+        self._active_funcs[func] = self._active_funcs.get(func, 0) + 1
+        self._active_lines[entry.line] = self._active_lines.get(entry.line, 0) + 1
+        return entry
+
+    def _sync(self, frame):
+        # Events normally arrive for the innermost frame; if they do not
+        # (tracing started mid-call), drop or add frames to match.
+        frame_id = id(frame)
+        frames = self._frames
+        if frames and frames[-1].frame_id == frame_id:
+            return frames[-1]
+        if any(f.frame_id == frame_id for f in frames):
+            while frames[-1].frame_id != frame_id:
+                self._pop()
+            return frames[-1]
+        return self._push(frame)
+
+    def _start_line(self, entry, line):
+        entry.line = line
+        entry.line_start = self.elapsed
+        self._active_lines[line] = self._active_lines.get(line, 0) + 1
+
+    def _end_line(self, entry):
+        line = entry.line
+        active = self._active_lines[line]
+        if active == 1:
+            stats = self.lines.get(line)
+            if stats is None:
+                stats = self.lines[line] = [0, 0, 0]
+            stats[1] += self.elapsed - entry.line_start
+            del self._active_lines[line]
+        else:
+            self._active_lines[line] = active - 1
+
+    def _pop(self):
+        entry = self._frames.pop()
+        self._end_line(entry)
+        func = entry.func
+        active = self._active_funcs[func]
+        if active == 1:
+            self.functions[func][2] += self.elapsed - entry.call_start
+            del self._active_funcs[func]
+        else:
+            self._active_funcs[func] = active - 1
+
+    def report(self):
+        """Plain dict of the timings (nanoseconds), safe to pickle::
+
+            {"elapsed_ns": ..., "lines": {line: {"self_ns", "total_ns", "cpu_ns"}},
+             "functions": {qualname: {"calls", "self_ns", "total_ns", "cpu_ns"}}}
+        """
+        return {
+            "elapsed_ns": self.elapsed,
+            "lines": {
+                line: {"self_ns": s, "total_ns": t, "cpu_ns": c}
+                for line, (s, t, c) in sorted(self.lines.items())
+                # line 0: a module frame before its first line
+                if line > 0
+            },
+            "functions": {
+                name: {"calls": n, "self_ns": s, "total_ns": t, "cpu_ns": c}
+                for name, (n, s, t, c) in self.functions.items()
+            },
+        }
@@ -0,0 +1,110 @@
+"""Where the tracer's own time goes (``Tracer(stats=True)``).
+
+Each recorded step is split into phases, timed with
+``time.perf_counter_ns`` and collected in power-of-two nanosecond
+histograms:
+
+    stack     profiler, line counts and call stack push/pop
+    locals    collecting and serializing the frame's locals, and the delta
+    globals   the same for globals
+    state     building the step (incl. reading the stdout offset)
+    store     appending it to the trace store (and spilling to disk)
+    on_step   the streaming callback (UI batching, worker pipe)
+    record    the whole step, all of the above
+
+next to counters for the events seen and filtered and the serializer's work.
+"""
+
+import time
+
+_clock = time.perf_counter_ns
+
+
+class Histogram:
+    """Durations counted in power-of-two nanosecond buckets: bucket `b`
+    holds values in ``[2**(b-1), 2**b)``."""
+
+    __slots__ = ("buckets", "count", "total_ns", "max_ns")
+
+    def __init__(self):
+        self.buckets = [0] * 64
+        self.count = 0
+        self.total_ns = 0
+        self.max_ns = 0
+
+    def add(self, ns):
+        self.buckets[min(ns.bit_length(), 63)] += 1
+        self.count += 1
+        self.total_ns += ns
+        if ns > self.max_ns:
+            self.max_ns = ns
+
+    def percentile(self, q):
+        """Upper bound (ns) of the bucket holding the `q` quantile."""
+        if not self.count:
+            return 0
+        rank = q * self.count
+        seen = 0
+        for bucket, n in enumerate(self.buckets):
+            seen += n
+            if n and seen >= rank:
+                return min(1 << bucket, self.max_ns)
+        return self.max_ns
+
+    def report(self):
+        return {
+            "count": self.count,
+            "total_ns": self.total_ns,
+            "mean_ns": self.total_ns // self.count if self.count else 0,
+            "p50_ns": self.percentile(0.5),
+            "p99_ns": self.percentile(0.99),
+            "max_ns": self.max_ns,
+            # bucket upper bound (ns) -> count
+            "buckets": {1 << b: n for b, n in enumerate(self.buckets) if n},
+        }
+
+
+class TracerStats:
+    PHASES = ("stack", "locals", "globals", "state", "store", "on_step")
+
+    def __init__(self):
+        self.phases = {name: Histogram() for name in self.PHASES + ("record",)}
+        self._order = [self.phases[name] for name in self.PHASES]
+        self._marks = []
+        self.events_seen = 0
+        self.events_filtered = 0
+        self.serializer_calls = 0
+
+    def begin(self):
+        self._marks = [_clock()]
+
+    def mark(self):
+        """End of the next phase of the current step."""
+        self._marks.append(_clock())
+
+    def end(self):
+        """End of the last phase; the step's phases are added up."""
+        marks = self._marks
+        marks.append(_clock())
+        for hist, start, stop in zip(self._order, marks, marks[1:]):
+            hist.add(stop - start)
+        self.phases["record"].add(marks[-1] - marks[0])
+
+    def report(self, tracer):
+        """Plain dict of histograms and counters; `tracer` supplies the
+        counts it keeps anyway."""
+        serializer = tracer.serializer
+        return {
+            "phases": {name: hist.report() for name, hist in self.phases.items()},
+            "counters": {
+                "events_seen": self.events_seen,
+                "events_filtered": self.events_filtered,
+                "events_recorded": self.phases["record"].count,
+                "serializer_calls": self.serializer_calls,
+                "serializer_cache_hits": serializer.hits,
+                "serializer_cache_misses": serializer.misses,
+                "spilled_steps": tracer.trace_data.spilled,
+                "spilled_bytes": tracer.trace_data.spilled_bytes,
+                "stdout_chars": tracer.stdout_buffer.tell(),
+            },
+        }
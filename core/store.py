@@ -0,0 +1,153 @@
+"""Trace storage with bounded memory.
+
+`TraceStore` is the sequence behind ``Tracer.trace_data``. The most recent
+`window` steps are kept as live objects; older ones are pickled, `CHUNK`
+steps per record, into an append-only temporary file and read back through
+a memory map, so a run of millions of steps keeps a flat resident size.
+Steps read back from the file are copies: a spilled step that changes
+(e.g. its stdout offset) has to be written back with replace().
+"""
+
+import array
+import collections
+import mmap
+import pickle
+import tempfile
+import threading
+
+
+class TraceStore:
+    DEFAULT_WINDOW = 10000
+    # steps per spilled record; one pickle per chunk shares the memo for
+    # class references and variable names
+    CHUNK = 256
+    # decoded chunks kept around for scrubbing / keyframe rebuilds
+    CACHE_CHUNKS = 4
+
+    def __init__(self, window=DEFAULT_WINDOW, owner=None):
+        self.window = max(1, window)
+        # set on steps read back from disk (the pickles leave it out)
+        self.owner = owner
+        self._recent = collections.deque()
+        self._spilled = 0
+        # start and length of each spilled chunk; a chunk written back by
+        # replace() moves to the end of the file
+        self._offsets = array.array("Q")
+        self._lengths = array.array("Q")
+        self._file = None
+        self._size = 0  # bytes written to the spill file
+        self._map = None
+        self._cache = collections.OrderedDict()
+        # the tracer thread appends while the UI thread reads
+        self._lock = threading.Lock()
+
+    @property
+    def spilled(self):
+        return self._spilled
+
+    @property
+    def spilled_bytes(self):
+        return self._size
+
+    def append(self, state):
+        with self._lock:
+            self._recent.append(state)
+            if len(self._recent) >= self.window + self.CHUNK:
+                self._spill([self._recent.popleft() for _ in range(self.CHUNK)])
+
+    def _spill(self, states):
+        if self._file is None:
+            self._file = tempfile.TemporaryFile(prefix="trace-", suffix=".bin")
+        self._offsets.append(0)
+        self._lengths.append(0)
+        self._write(len(self._offsets) - 1, states)
+        self._spilled += len(states)
+
+    def _write(self, chunk_no, states):
+        data = pickle.dumps(states, pickle.HIGHEST_PROTOCOL)
+        self._file.seek(self._size)
+        self._file.write(data)
+        self._offsets[chunk_no] = self._size
+        self._lengths[chunk_no] = len(data)
+        self._size += len(data)
+
+    def _load(self, index):
+        chunk_no, pos = divmod(index, self.CHUNK)
+        return self._chunk(chunk_no)[pos]
+
+    def _chunk(self, chunk_no):
+        chunk = self._cache.get(chunk_no)
+        if chunk is not None:
+            self._cache.move_to_end(chunk_no)
+            return chunk
+
+        start = self._offsets[chunk_no]
+        end = start + self._lengths[chunk_no]
+        if self._map is None or len(self._map) < end:
+            # the file has grown past the current mapping
+            self._file.flush()
+            if self._map is not None:
+                self._map.close()
+            self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        chunk = pickle.loads(self._map[start:end])
+        for state in chunk:
+            state.owner = self.owner
+        self._cache[chunk_no] = chunk
+        if len(self._cache) > self.CACHE_CHUNKS:
+            self._cache.popitem(last=False)
+        return chunk
+
+    def __len__(self):
+        return self._spilled + len(self._recent)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        with self._lock:
+            spilled = self._spilled
+            total = spilled + len(self._recent)
+            if index < 0:
+                index += total
+            if not 0 <= index < total:
+                raise IndexError("trace index out of range")
+            if index >= spilled:
+                return self._recent[index - spilled]
+            return self._load(index)
+
+    def replace(self, index, state):
+        """Store `state` as step `index`; a spilled step's chunk is
+        written again."""
+        with self._lock:
+            spilled = self._spilled
+            if index >= spilled:
+                self._recent[index - spilled] = state
+                return
+            chunk_no, pos = divmod(index, self.CHUNK)
+            chunk = self._chunk(chunk_no)
+            chunk[pos] = state
+            self._write(chunk_no, chunk)
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+    def __bool__(self):
+        return len(self) > 0
+
+    def __eq__(self, other):
+        if not isinstance(other, (TraceStore, list)):
+            return NotImplemented
+        return len(self) == len(other) and all(a == b for a, b in zip(self, other))
+
+    __hash__ = None
+
+    def close(self):
+        with self._lock:
+            self._cache.clear()
+            if self._map is not None:
+                self._map.close()
+                self._map = None
+            if self._file is not None:
+                self._file.close()
+                self._file = None
@@ -71,6 +71,11 @@ class InteractiveTerminal(MDBoxLayout):
         # Pyte screen buffer and history stream
         self._screen = pyte.HistoryScreen(self._columns, self._lines, history=1000)
         self._stream = pyte.Stream(self._screen)
+        # Text last fed by sync_with_stdout (None once the screen was fed
+        # from anywhere else) and per-row markup caches for _render_screen
+        self._synced_text = None
+        self._screen_markup = [""] * self._lines
+        self._history_markup = {}
 
         Builder.load_string(
             """
@@ -240,19 +245,15 @@ class InteractiveTerminal(MDBoxLayout):
             elif data in ("\x08", "\x7f"): # backspace / del
                 if len(self._input_buffer) > 0:
                     self._input_buffer = self._input_buffer[:-1]
-                    # Direct buffer manipulation for better sync
-                    if self._executor.tracer and self._executor.tracer.stdout_buffer:
-                        buf = self._executor.tracer.stdout_buffer
-                        content = buf.getvalue()
-                        buf.truncate(0)
-                        buf.seek(0)
-                        buf.write(content[:-1])
+                    # Drop the echoed character from the tail of the stdout log
+                    if self._executor.tracer:
+                        self._executor.tracer.erase_stdout(1)
                         self._executor.tracer.refresh_stdout()
             else:
                 self._input_buffer += data
                 # Feed the typed character into the tracer's stdout buffer so it shows up in real-time
-                if self._executor.tracer and self._executor.tracer.stdout_buffer:
-                    self._executor.tracer.stdout_buffer.write(data)
+                if self._executor.tracer:
+                    self._executor.tracer.append_stdout(data)
                     self._executor.tracer.refresh_stdout()
             return
 
@@ -274,12 +275,24 @@ class InteractiveTerminal(MDBoxLayout):
             self._write_to_pty("\x03")
 
     def sync_with_stdout(self, text):
-        self._screen.reset()
-        self._screen.history.top.clear()
-        self._screen.history.bottom.clear()
+        synced = self._synced_text
+        if synced is not None and text.startswith(synced) and not synced.endswith("\r"):
+            # Playback only ever appends output: feed just the new suffix
+            if len(text) == len(synced):
+                return
+            new_text = text[len(synced):]
+        else:
+            # Scrubbed backwards or the text was edited: replay everything
+            # (with a fresh parser, the old one may be mid escape sequence)
+            self._screen.reset()
+            self._screen.history.top.clear()
+            self._screen.history.bottom.clear()
+            self._stream = pyte.Stream(self._screen)
+            new_text = text
         # Convert all newlines to CRLF for proper terminal display
-        text = text.replace('\r\n', '\n').replace('\n', '\r\n')
-        self._stream.feed(text)
+        new_text = new_text.replace('\r\n', '\n').replace('\n', '\r\n')
+        self._stream.feed(new_text)
+        self._synced_text = text
         self._render_screen()
 
     def start_shell(self):
@@ -373,55 +386,70 @@ class InteractiveTerminal(MDBoxLayout):
     @mainthread
     def _append_output(self, text):
         # Feed exactly into pyte emulator
+        self._synced_text = None
         self._stream.feed(text)
         self._render_screen()
 
-    def _render_screen(self):
-        lines = []
+    def _format_line(self, screen_line_dict):
+        fmt_line = ""
+        current_fg = None
+        current_bg = None
+        current_text = ""
         
-        def process_line(screen_line_dict):
-            fmt_line = ""
-            current_fg = None
-            current_bg = None
-            current_text = ""
-            
-            def close_tags():
-                res = ""
-                if current_text:
-                    if current_bg: res += f"[backcolor={current_bg}]"
-                    if current_fg: res += f"[color={current_fg}]"
-                    res += current_text
-                    if current_fg: res += "[/color]"
-                    if current_bg: res += "[/backcolor]"
-                return res
-
-            for x in range(self._columns):
-                char = screen_line_dict.get(x)
-                if not char:
-                    fg, bg, text = None, None, " "
-                else:
-                    fg = PYTE_COLORS.get(char.fg, char.fg) if char.fg != "default" else None
-                    bg = PYTE_COLORS.get(char.bg, char.bg) if char.bg != "default" else None
-                    
-                    text = char.data
-                    # Custom minimal markup escape to dodge Kivy parser errors
-                    text = text.replace("&", "&amp;").replace("[", "&bl;").replace("]", "&br;")
-                    if not text: text = " "
+        def close_tags():
+            res = ""
+            if current_text:
+                if current_bg: res += f"[backcolor={current_bg}]"
+                if current_fg: res += f"[color={current_fg}]"
+                res += current_text
+                if current_fg: res += "[/color]"
+                if current_bg: res += "[/backcolor]"
+            return res
+
+        for x in range(self._columns):
+            char = screen_line_dict.get(x)
+            if not char:
+                fg, bg, text = None, None, " "
+            else:
+                fg = PYTE_COLORS.get(char.fg, char.fg) if char.fg != "default" else None
+                bg = PYTE_COLORS.get(char.bg, char.bg) if char.bg != "default" else None
                 
-                if fg != current_fg or bg != current_bg:
-                    fmt_line += close_tags()
-                    current_fg = fg
-                    current_bg = bg
-                    current_text = text
-                else:
-                    current_text += text
+                text = char.data
+                # Custom minimal markup escape to dodge Kivy parser errors
+                text = text.replace("&", "&amp;").replace("[", "&bl;").replace("]", "&br;")
+                if not text: text = " "
             
-            fmt_line += close_tags()
-            return fmt_line
+            if fg != current_fg or bg != current_bg:
+                fmt_line += close_tags()
+                current_fg = fg
+                current_bg = bg
+                current_text = text
+            else:
+                current_text += text
+        
+        fmt_line += close_tags()
+        return fmt_line
 
-        # Process history that rolled off
+    def _render_screen(self):
+        lines = []
+
+        # Only rows pyte reports as dirty need their markup rebuilt
+        for y in self._screen.dirty:
+            if 0 <= y < self._lines:
+                self._screen_markup[y] = self._format_line(self._screen.buffer[y])
+        self._screen.dirty.clear()
+
+        # Process history that rolled off. Rows never change once they are
+        # in history, so their markup is cached per row object (the cache
+        # holds the row itself, so its id can't be reused while cached).
+        history_markup = {}
         for h_line in self._screen.history.top:
-            lines.append(process_line(h_line))
+            cached = self._history_markup.get(id(h_line))
+            if cached is None or cached[0] is not h_line:
+                cached = (h_line, self._format_line(h_line))
+            history_markup[id(h_line)] = cached
+            lines.append(cached[1])
+        self._history_markup = history_markup
             
         # Determine the last active line to display
         max_y = self._screen.cursor.y
@@ -432,10 +460,8 @@ class InteractiveTerminal(MDBoxLayout):
                 break
 
         # Process active screen up to max_y
-        for y in range(max_y + 1):
-            line_buf = self._screen.buffer[y]
-            # avoid pushing many empty trailing spaces
-            lines.append(process_line(line_buf))
+        # avoid pushing many empty trailing spaces
+        lines.extend(self._screen_markup[: max_y + 1])
 
         self.output_text = "\n".join(lines)
         
@@ -451,6 +477,7 @@ class InteractiveTerminal(MDBoxLayout):
         self.start_shell()
 
     def clear(self):
+        self._synced_text = None
         self._screen.reset()
         self._screen.history.top.clear()
         self._screen.history.bottom.clear()
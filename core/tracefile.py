@@ -0,0 +1,360 @@
+"""Binary trace files: a recorded run that can be replayed without re-executing.
+
+Layout (all integers little-endian)::
+
+    MAGIC
+    records ...            pickled steps and heap payloads, in write order
+    meta                   pickled dict: code, line counts, error, ...
+    stdout                 UTF-8 stdout log
+    index                  8-byte aligned uint64 arrays:
+                             step offsets, step lengths,
+                             heap offsets, heap lengths
+    trailer                TRAILER struct, ends with MAGIC
+
+Heap payloads (serialized objects, see SerializerSession) are written once
+and every step referring to them stores a HeapRef stub, so unchanged
+objects cost nothing per step. The reader memory-maps the file and only
+decodes the trailer, the meta record and the steps actually read; the index
+arrays are views into the map, so opening a 1M-step trace is O(1).
+"""
+
+import array
+import collections
+import io
+import mmap
+import pickle
+import struct
+import sys
+
+from core.tracer import ExecutionState, StateDelta, Tracer
+
+MAGIC = b"PYVTRACE"
+VERSION = 2
+SUFFIX = ".pvtrace"
+
+# meta offset/length, stdout offset/length, index offset, steps, heap
+# entries, version, magic
+TRAILER = struct.Struct("<QQQQQQQQ8s")
+
+# identity-keyed memo of written payloads; cleared when it grows past this
+# (a payload written twice only costs space)
+MEMO_LIMIT = 200000
+
+# decoded heap payloads kept by a reader; least recently used are dropped
+HEAP_CACHE_LIMIT = 4096
+
+
+class HeapRef:
+    """Stands in for a heap payload inside a step record."""
+
+    __slots__ = ("number",)
+
+    def __init__(self, number):
+        self.number = number
+
+    def __reduce__(self):
+        return (HeapRef, (self.number,))
+
+
+# ExecutionState fields holding variable snapshots / deltas
+_FIELDS = ExecutionState._PICKLED
+_SNAPSHOTS = (_FIELDS.index("_locals"), _FIELDS.index("_globals"))
+_DELTAS = (_FIELDS.index("locals_delta"), _FIELDS.index("globals_delta"))
+
+
+class _RecordPickler(pickle.Pickler):
+    def __init__(self, file, writer):
+        super().__init__(file, pickle.HIGHEST_PROTOCOL)
+        self._writer = writer
+        self._root = None
+
+    def dump_record(self, obj, root=None):
+        # `root` is the payload being written as its own heap record
+        self._root = root
+        self.dump(obj)
+
+    def persistent_id(self, obj):
+        if type(obj) is not dict or "__ref__" not in obj or obj is self._root:
+            return None
+        return ("heap", self._writer._heap_ref(obj))
+
+
+class TraceWriter:
+    """Writes one run to `path`. Steps must be appended in order."""
+
+    def __init__(self, path):
+        self._file = open(path, "wb")
+        self._file.write(MAGIC)
+        self._step_offsets = array.array("Q")
+        self._step_lengths = array.array("Q")
+        self._heap_offsets = array.array("Q")
+        self._heap_lengths = array.array("Q")
+        # id(payload) -> (payload, heap number); holding the payload keeps
+        # its id from being reused
+        self._memo = {}
+
+    def _write_record(self, obj, offsets, lengths, root=None):
+        buf = io.BytesIO()
+        _RecordPickler(buf, self).dump_record(obj, root)
+        data = buf.getvalue()
+        # nested payloads were written while pickling, so tell() is current
+        offsets.append(self._file.tell())
+        lengths.append(len(data))
+        self._file.write(data)
+
+    def _heap_ref(self, payload):
+        entry = self._memo.get(id(payload))
+        if entry is not None:
+            return entry[1]
+        if len(self._memo) >= MEMO_LIMIT:
+            self._memo.clear()
+        self._write_record(payload, self._heap_offsets, self._heap_lengths, root=payload)
+        # numbered after its nested payloads, which are written first
+        number = len(self._heap_offsets) - 1
+        self._memo[id(payload)] = (payload, number)
+        return number
+
+    def _stub(self, value):
+        if type(value) is dict and "__ref__" in value:
+            return HeapRef(self._heap_ref(value))
+        return value
+
+    def _stub_vars(self, vars_dict):
+        return {k: self._stub(v) for k, v in vars_dict.items()}
+
+    def add_step(self, state):
+        # Only the top level of a step can hold payloads, so it is stubbed
+        # here and pickled without a persistent_id hook (which would run
+        # for every object in the step).
+        fields = list(state.__getstate__())
+        for i in _SNAPSHOTS:
+            if fields[i] is not None:
+                fields[i] = self._stub_vars(fields[i])
+        for i in _DELTAS:
+            delta = fields[i]
+            fields[i] = StateDelta(self._stub_vars(delta.changed), delta.removed, delta.order)
+        data = pickle.dumps(tuple(fields), pickle.HIGHEST_PROTOCOL)
+        self._step_offsets.append(self._file.tell())
+        self._step_lengths.append(len(data))
+        self._file.write(data)
+
+    def finish(self, code="", stdout="", line_counts=None, error=None,
+               limit_reached=False, keyframe_interval=1, profile=None, sampled_from=None):
+        meta = pickle.dumps(
+            {
+                "code": code,
+                "line_counts": dict(line_counts or {}),
+                "profile": profile,
+                "sampled_from": sampled_from,
+                "error": error,
+                "limit_reached": limit_reached,
+                "keyframe_interval": keyframe_interval,
+            },
+            pickle.HIGHEST_PROTOCOL,
+        )
+        f = self._file
+        meta_offset = f.tell()
+        f.write(meta)
+
+        stdout_bytes = stdout.encode("utf-8")
+        stdout_offset = f.tell()
+        f.write(stdout_bytes)
+
+        f.write(b"\0" * (-f.tell() % 8))
+        index_offset = f.tell()
+        for arr in (self._step_offsets, self._step_lengths, self._heap_offsets, self._heap_lengths):
+            if sys.byteorder != "little":
+                arr = array.array("Q", arr)
+                arr.byteswap()
+            f.write(arr.tobytes())
+
+        f.write(TRAILER.pack(
+            meta_offset, len(meta), stdout_offset, len(stdout_bytes), index_offset,
+            len(self._step_offsets), len(self._heap_offsets), VERSION, MAGIC,
+        ))
+        f.close()
+        self._memo.clear()
+
+
+def write_trace(path, tracer, code="", error=None):
+    """Save everything `tracer` recorded for `code`."""
+    writer = TraceWriter(path)
+    try:
+        for state in tracer.get_trace():
+            writer.add_step(state)
+    except BaseException:
+        writer._file.close()
+        raise
+    writer.finish(
+        code=code,
+        stdout=tracer.get_stdout(),
+        line_counts=tracer.line_counts,
+        error=error,
+        limit_reached=tracer.limit_reached,
+        keyframe_interval=tracer.keyframe_interval,
+        profile=tracer.get_profile(),
+        sampled_from=tracer.sampled_from,
+    )
+
+
+# the only globals a trace file may name; anything else in a record means
+# the file was not written by TraceWriter and must not be decoded, since
+# unpickling an arbitrary global can run code
+_ALLOWED_GLOBALS = frozenset((
+    ("core.tracer", "StateDelta"),
+    ("core.tracer", "ExecutionState"),
+    ("core.tracer", "CallStack"),
+    ("core.tracer", "_rebuild_stack"),
+    ("core.tracer", "EMPTY_STACK"),
+    ("core.tracefile", "HeapRef"),
+    ("builtins", "set"),
+    ("builtins", "frozenset"),
+    ("builtins", "complex"),
+    ("builtins", "bytearray"),
+))
+
+
+class _RecordUnpickler(pickle.Unpickler):
+    def __init__(self, file, reader=None):
+        super().__init__(file)
+        self._reader = reader
+
+    def find_class(self, module, name):
+        if (module, name) not in _ALLOWED_GLOBALS:
+            raise pickle.UnpicklingError(f"trace file refers to forbidden global {module}.{name}")
+        return super().find_class(module, name)
+
+    def persistent_load(self, pid):
+        if self._reader is None:
+            raise pickle.UnpicklingError("unexpected heap reference")
+        return self._reader._heap(pid[1])
+
+
+class TraceFile:
+    """Read-only sequence of the steps in a trace file."""
+
+    def __init__(self, path, owner=None):
+        with open(path, "rb") as f:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if len(self._map) < len(MAGIC) + TRAILER.size or self._map[: len(MAGIC)] != MAGIC:
+            self._map.close()
+            raise ValueError(f"{path} is not a trace file")
+        (meta_offset, meta_length, stdout_offset, stdout_length, index_offset,
+         steps, heap, version, magic) = TRAILER.unpack_from(self._map, len(self._map) - TRAILER.size)
+        if magic != MAGIC or version != VERSION:
+            self._map.close()
+            raise ValueError(f"{path}: unsupported or truncated trace file")
+
+        self.owner = owner
+        try:
+            meta = _RecordUnpickler(io.BytesIO(self._map[meta_offset : meta_offset + meta_length])).load()
+        except Exception:
+            self._map.close()
+            raise
+        self.code = meta["code"]
+        self.line_counts = meta["line_counts"]
+        self.profile = meta["profile"]
+        self.sampled_from = meta["sampled_from"]
+        self.error = meta["error"]
+        self.limit_reached = meta["limit_reached"]
+        self.keyframe_interval = meta["keyframe_interval"]
+        self._stdout_span = (stdout_offset, stdout_length)
+
+        view = memoryview(self._map)[index_offset : index_offset + 8 * (2 * steps + 2 * heap)]
+        if sys.byteorder == "little":
+            index = view.cast("Q")
+        else:
+            index = array.array("Q", view)
+            index.byteswap()
+            view.release()
+        self._step_offsets = index[:steps]
+        self._step_lengths = index[steps : 2 * steps]
+        self._heap_offsets = index[2 * steps : 2 * steps + heap]
+        self._heap_lengths = index[2 * steps + heap :]
+        self._views = [view, index] if isinstance(index, memoryview) else []
+        self._heap_cache = collections.OrderedDict()
+
+    @property
+    def stdout(self):
+        offset, length = self._stdout_span
+        return str(self._map[offset : offset + length], "utf-8")
+
+    def _read(self, offset, length):
+        buf = io.BytesIO(self._map[offset : offset + length])
+        return _RecordUnpickler(buf, self).load()
+
+    def _unstub_vars(self, vars_dict):
+        for k, v in vars_dict.items():
+            if type(v) is HeapRef:
+                vars_dict[k] = self._heap(v.number)
+
+    def _heap(self, number):
+        # recently used payloads are decoded once, so nearby steps share them
+        cache = self._heap_cache
+        payload = cache.get(number)
+        if payload is None:
+            payload = self._read(self._heap_offsets[number], self._heap_lengths[number])
+            cache[number] = payload
+            if len(cache) > HEAP_CACHE_LIMIT:
+                cache.popitem(last=False)
+        else:
+            cache.move_to_end(number)
+        return payload
+
+    def __len__(self):
+        return len(self._step_offsets)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("trace index out of range")
+        offset = self._step_offsets[index]
+        fields = self._read(offset, self._step_lengths[index])
+        for i in _SNAPSHOTS:
+            if fields[i] is not None:
+                self._unstub_vars(fields[i])
+        for i in _DELTAS:
+            self._unstub_vars(fields[i].changed)
+        state = ExecutionState.__new__(ExecutionState)
+        state.__setstate__(fields)
+        state.owner = self.owner
+        return state
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+    def __bool__(self):
+        return len(self) > 0
+
+    def close(self):
+        self._heap_cache.clear()
+        # the index views must be released before the map can close
+        arrays = [self._step_offsets, self._step_lengths, self._heap_offsets, self._heap_lengths]
+        for arr in arrays + self._views:
+            if isinstance(arr, memoryview):
+                arr.release()
+        self._map.close()
+
+
+def load_trace(path):
+    """Open a trace file as a finished Tracer whose steps are read lazily.
+
+    Returns (tracer, code); the tracer supports get_state()/get_stdout()
+    like the one that recorded the run.
+    """
+    tracer = Tracer()
+    trace = TraceFile(path, owner=tracer)
+    tracer.trace_data = trace
+    tracer.line_counts = trace.line_counts
+    tracer.profile = trace.profile
+    tracer.sampled_from = trace.sampled_from
+    tracer.limit_reached = trace.limit_reached
+    tracer.keyframe_interval = trace.keyframe_interval
+    tracer.step_count = len(trace)
+    tracer.stdout_buffer = io.StringIO(trace.stdout)
+    tracer.stdout_buffer.seek(0, io.SEEK_END)
+    return tracer, trace.code
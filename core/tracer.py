@@ -1,118 +1,575 @@
+import collections
+import dis
+import io
 import sys
 import types
-from utils.serializer import Serializer
+from core.profiler import LineProfiler
+from core.stats import TracerStats
+from core.store import TraceStore
+from utils.serializer import SCALAR_TYPES, SerializerSession
 
 
 class ExecutionLimitReached(Exception):
     pass
 
 
+class StepBatcher:
+    """on_step sink that hands steps to a consumer in batches.
+
+    Steps are appended to a deque (atomic under the GIL, so the tracer
+    thread never takes a lock) and a single flush is scheduled through
+    `schedule` (e.g. Kivy's ``Clock.schedule_once``) until it has run, so
+    the consumer gets at most one call per frame with every step captured
+    since the previous one.
+    """
+
+    def __init__(self, deliver, schedule):
+        self.deliver = deliver
+        self.schedule = schedule
+        self._pending = collections.deque()
+        self._scheduled = False
+
+    def __call__(self, state):
+        self._pending.append(state)
+        if not self._scheduled:
+            self._scheduled = True
+            self.schedule(self.flush)
+
+    def flush(self, *args):
+        # clear the flag first: a step appended while draining schedules
+        # another flush instead of being stranded
+        self._scheduled = False
+        batch = []
+        while True:
+            try:
+                batch.append(self._pending.popleft())
+            except IndexError:
+                break
+        if batch:
+            self.deliver(batch)
+
+
+class Sampler:
+    """Decides which line events become steps in sampling mode.
+
+    The first `keep_first` events are all kept. After that only every
+    `period`-th line event is, and the period is re-sized at each kept
+    step from the events seen so far and the steps left in the budget, as
+    if the run ended after another 1/HORIZON of the events it has already
+    had. The budget is never quite spent, so a run of any length settles
+    just under `target_steps` steps. call/return/exception events are
+    always kept; line counts stay exact because the tracer counts before
+    asking.
+    """
+
+    __slots__ = ("keep_first", "target_steps", "period", "elided",
+                 "_events", "_phase", "_remaining")
+
+    HORIZON = 2
+
+    def __init__(self, keep_first=10000, target_steps=100000):
+        self.keep_first = keep_first
+        self.target_steps = target_steps
+        self.period = 1
+        self.elided = 0  # line events dropped since the last kept step
+        self._events = 0
+        self._phase = 0
+        self._remaining = target_steps - keep_first
+
+    def keep(self, event):
+        self._events += 1
+        if self._events <= self.keep_first:
+            return True
+        if event == "line":
+            self._phase += 1
+            if self._phase < self.period:
+                self.elided += 1
+                return False
+            self._phase = 0
+        self._remaining -= 1
+        self.period = max(1, self._events // (self.HORIZON * max(1, self._remaining)))
+        return True
+
+    def take_elided(self):
+        elided, self.elided = self.elided, 0
+        return elided
+
+
+class StateDelta:
+    """Variables added/changed and removed relative to the previous step."""
+
+    def __init__(self, changed, removed=(), order=None):
+        self.changed = changed
+        self.removed = removed
+        # key order of the new snapshot, when apply() would not give it
+        # (a local bound before one listed earlier in the frame, ...)
+        self.order = order
+
+    @staticmethod
+    def key_order(prev_vars, cur_vars, removed):
+        """Keys of `cur_vars` in order if applying the delta to `prev_vars`
+        would order them differently, else None."""
+        keys = tuple(cur_vars)
+        if not removed and len(keys) == len(prev_vars) and keys == tuple(prev_vars):
+            return None
+        natural = [k for k in prev_vars if k in cur_vars]
+        natural.extend(k for k in keys if k not in prev_vars)
+        return None if keys == tuple(natural) else keys
+
+    def apply(self, base_vars):
+        result = dict(base_vars)
+        for k in self.removed:
+            result.pop(k, None)
+        result.update(self.changed)
+        if self.order is not None:
+            return {k: result[k] for k in self.order}
+        return result
+
+
+_MISSING = object()
+
+# payloads compared by value rather than identity
+_PLAIN = (bool, int, float, str)
+
+# global values whose payload only changes when the name is rebound
+_STABLE = frozenset(SCALAR_TYPES + (types.FunctionType, types.BuiltinFunctionType))
+
+# Opcodes that cannot change an existing object. A line made only of these
+# leaves every object it did not rebind as it was; a user-defined dunder
+# method one of them calls raises events of its own. Inplace BINARY_OPs are
+# allowed too, provided the old value of the name they store to is immutable.
+_PURE_OPS = frozenset((
+    "NOP", "RESUME", "CACHE", "EXTENDED_ARG", "NOT_TAKEN", "POP_TOP", "PUSH_NULL", "COPY", "SWAP",
+    "LOAD_CONST", "LOAD_SMALL_INT", "LOAD_FAST", "LOAD_FAST_CHECK", "LOAD_FAST_BORROW",
+    "LOAD_FAST_LOAD_FAST", "LOAD_FAST_BORROW_LOAD_FAST_BORROW", "LOAD_NAME", "LOAD_GLOBAL",
+    "LOAD_DEREF", "STORE_FAST", "STORE_FAST_LOAD_FAST", "STORE_FAST_STORE_FAST", "STORE_NAME",
+    "STORE_GLOBAL", "STORE_DEREF", "BINARY_OP", "COMPARE_OP", "IS_OP", "CONTAINS_OP",
+    "UNARY_NEGATIVE", "UNARY_NOT", "UNARY_INVERT", "TO_BOOL", "POP_JUMP_IF_TRUE",
+    "POP_JUMP_IF_FALSE", "POP_JUMP_IF_NONE", "POP_JUMP_IF_NOT_NONE", "JUMP_FORWARD",
+    "JUMP_BACKWARD", "JUMP_BACKWARD_NO_INTERRUPT", "JUMP", "JUMP_NO_INTERRUPT", "RETURN_VALUE",
+    "RETURN_CONST", "BUILD_TUPLE", "BUILD_LIST", "BUILD_SET", "BUILD_MAP", "BUILD_STRING",
+    "FORMAT_SIMPLE", "FORMAT_WITH_SPEC", "CONVERT_VALUE",
+))
+
+# values an inplace operator replaces instead of changing
+_IMMUTABLE = frozenset(SCALAR_TYPES + (tuple, frozenset))
+
+_NO_NAMES = frozenset()
+
+
+class CallStack:
+    """Persistent call stack: one node per user frame, linked to its caller.
+
+    Pushing returns a new node and popping returns the parent, so steps
+    recorded in the same frame share one stack object and a call only
+    allocates its own node. Iterating yields the frames outermost first.
+    """
+
+    __slots__ = ("name", "frame_id", "parent", "depth")
+
+    def __init__(self, name=None, frame_id=None, parent=None):
+        self.name = name
+        self.frame_id = frame_id
+        self.parent = parent
+        self.depth = parent.depth + 1 if parent is not None else 0
+
+    def push(self, name, frame_id):
+        return CallStack(name, frame_id, self)
+
+    def __len__(self):
+        return self.depth
+
+    def __reversed__(self):
+        node = self
+        while node.depth:
+            yield node
+            node = node.parent
+
+    def __iter__(self):
+        frames = list(reversed(self))
+        frames.reverse()
+        return iter(frames)
+
+    def _key(self):
+        return tuple(f.frame_id for f in reversed(self))
+
+    def __eq__(self, other):
+        if not isinstance(other, CallStack):
+            return NotImplemented
+        return self is other or (self.depth == other.depth and self._key() == other._key())
+
+    def __hash__(self):
+        return hash(self._key())
+
+    def __reduce__(self):
+        if self is EMPTY_STACK:
+            return "EMPTY_STACK"
+        # flat, so deep recursion doesn't hit pickle's nesting limit
+        return (_rebuild_stack, (tuple((f.name, f.frame_id) for f in self),))
+
+    def __repr__(self):
+        return f"CallStack({[f.name for f in self]})"
+
+
+EMPTY_STACK = CallStack()
+
+
+def _rebuild_stack(frames):
+    stack = EMPTY_STACK
+    for name, frame_id in frames:
+        stack = stack.push(name, frame_id)
+    return stack
+
+
 class ExecutionState:
+    __slots__ = (
+        "line_number",
+        "event",
+        "func_name",
+        "stack",
+        "locals_delta",
+        "globals_delta",
+        "stdout_offset",
+        "exception",
+        "line_count",
+        "elided",
+        "_locals",
+        "_globals",
+        "index",
+        "owner",
+    )
+    _PICKLED = __slots__[:-1]
+
     def __init__(
         self,
         line_number,
         event,
         func_name,
         stack,
-        locals,
-        globals,
-        stdout,
+        locals_delta,
+        globals_delta,
+        stdout_offset,
         exception=None,
         line_count=0,
+        locals=None,
+        globals=None,
+        elided=0,
     ):
         self.line_number = line_number
         self.event = event
         self.func_name = func_name
         self.stack = stack
-        self.locals = locals
-        self.globals = globals
-        self.stdout = stdout
+        self.locals_delta = locals_delta
+        self.globals_delta = globals_delta
+        self.stdout_offset = stdout_offset
         self.exception = exception
         self.line_count = line_count
+        # line events dropped by sampling right before this step
+        self.elided = elided
+        # Full snapshots are only kept on keyframes; other steps rebuild
+        # them through the owning tracer.
+        self._locals = locals
+        self._globals = globals
+        self.index = None
+        self.owner = None
+
+    def __getstate__(self):
+        # the owning tracer stays behind when a step is sent to another process
+        return tuple([getattr(self, name) for name in self._PICKLED])
+
+    def __setstate__(self, state):
+        for name, value in zip(self._PICKLED, state):
+            setattr(self, name, value)
+        self.owner = None
+
+    @property
+    def is_keyframe(self):
+        return self._locals is not None
+
+    @property
+    def stdout(self):
+        if self.owner is None:
+            return ""
+        return self.owner.get_stdout(self.stdout_offset)
+
+    @property
+    def locals(self):
+        if self._locals is not None:
+            return self._locals
+        return self.owner.get_state(self.index).locals
+
+    @property
+    def globals(self):
+        if self._globals is not None:
+            return self._globals
+        return self.owner.get_state(self.index).globals
 
 
 class Tracer:
-    def __init__(self, stdout_buffer=None, max_steps=10000, stop_event=None, on_step=None):
-        self.trace_data = []
-        self.serializer = Serializer()
-        self.stdout_buffer = stdout_buffer
+    def __init__(
+        self,
+        stdout_buffer=None,
+        max_steps=10000,
+        stop_event=None,
+        on_step=None,
+        keyframe_interval=100,
+        trace_window=TraceStore.DEFAULT_WINDOW,
+        stats=False,
+        profile=False,
+        scope=None,
+        global_writes=None,
+        sample_after=None,
+        sample_target=100000,
+    ):
+        # the most recent `trace_window` steps stay in memory, older ones
+        # are spilled to disk
+        self.trace_data = TraceStore(trace_window, owner=self)
+        self.serializer = SerializerSession()
+        # Append-only log of everything the program printed; steps only
+        # keep an offset into it.
+        self.stdout_buffer = stdout_buffer if stdout_buffer is not None else io.StringIO()
+        self._stdout_erasures = 0
+        self._stdout_cache = (None, "")
         self.line_counts = {}
+        # time spent on each line / function, only with ``profile=True``
+        # (it reads two clocks per event); `profile` holds the report
+        # instead when the timings come from elsewhere (a worker process
+        # or a trace file)
+        self.profiler = LineProfiler() if profile else None
+        self.profile = None
+        # per-phase timings of the tracer itself, see stats()
+        self._stats = TracerStats() if stats else None
+        # parts of the program to record (core.parser.TraceScope); None
+        # records everything
+        self.scope = scope
+        # names functions may rebind as globals (CodeParser.global_writes).
+        # While only code that cannot rebind any has run since the last
+        # step, the globals snapshot is refreshed instead of rebuilt; None
+        # (or a scope, whose skipped events are not followed) rebuilds it
+        # on every step.
+        self.global_writes = global_writes if scope is None else None
+        self._globals_dirty = True
+        self._rebinds_globals = {}  # code object -> may rebind globals
+        self._mutable_globals = ()  # names refresh has to serialize again
+        # Identity snapshots: while only pure lines (see _PURE_OPS) ran since
+        # the last step, a variable still bound to the same object keeps its
+        # payload without being serialized again. `_pending` is what the code
+        # running until the next event may do: None if it may change
+        # objects, else the names whose old values must be immutable.
+        self._identity = scope is None
+        self._pending = None
+        self._line_effects = {}  # code object -> {line: None or names}
+        self._last_local_objects = {}
+        self._last_global_objects = {}
+        # sampling mode: past `sample_after` events only some line events
+        # become steps (see Sampler)
+        self.sampler = None if sample_after is None else Sampler(sample_after, sample_target)
+        # index of the first step after which line events were dropped
+        self.sampled_from = None
         self.max_steps = max_steps
         self.step_count = 0
         self.limit_reached = False
         self.stop_event = stop_event
         self.on_step = on_step
+        self.keyframe_interval = max(1, keyframe_interval)
 
-    def trace(self, frame, event, arg):
+        # last recorded snapshot, used to compute the next delta
+        self._last_locals = {}
+        self._last_globals = {}
+        # call stack of the frame being traced, pushed on "call" and
+        # popped on "return"
+        self._stack = EMPTY_STACK
+        # last state rebuilt by get_state(), so sequential playback only
+        # applies one delta per step
+        self._cursor = None
+
+    def start(self, code):
+        sys.settrace(self.trace)
+
+    def stop(self):
+        sys.settrace(None)
+        if self.profiler is not None:
+            self.profiler.finish()
+
+    def _check_limits(self):
         if self.limit_reached or (self.stop_event and self.stop_event.is_set()):
             self.limit_reached = True
             raise ExecutionLimitReached("Execution limit reached or stopped by user")
 
+    def trace(self, frame, event, arg):
+        self._check_limits()
+        if self._stats is not None:
+            self._stats.events_seen += 1
+
         co = frame.f_code
         filename = co.co_filename
 
         if filename != "<string>":
+            if self._stats is not None:
+                self._stats.events_filtered += 1
             return None
 
         if event not in ["line", "return", "call", "exception"]:
+            if self._stats is not None:
+                self._stats.events_filtered += 1
             return self.trace
 
+        scope = self.scope
+        if scope is not None and not scope.traces(co.co_name, frame.f_lineno):
+            if event == "call" and not scope.traces_function(co.co_name):
+                # the whole frame is out of scope
+                return self._count_lines if scope.count_excluded else None
+            if event == "line":
+                self._count_line(frame.f_lineno)
+            return self.trace
+
+        self._record(frame, event, arg)
+        return self.trace
+
+    def _count_line(self, line_no):
+        self.line_counts[line_no] = self.line_counts.get(line_no, 0) + 1
+
+    def _count_lines(self, frame, event, arg):
+        """Local trace function of out-of-scope frames: lines are counted,
+        nothing is recorded."""
+        self._check_limits()
+        if event == "line":
+            self._count_line(frame.f_lineno)
+        return self._count_lines
+
+    def _record(self, frame, event, arg):
+        stats = self._stats
+        if stats is not None:
+            stats.begin()
+        profiler = self.profiler
+        if profiler is not None:
+            profiler.pause(frame, event)
+        co = frame.f_code
         line_no = frame.f_lineno
 
         if event == "line":
             self.line_counts[line_no] = self.line_counts.get(line_no, 0) + 1
+        if self.sampler is not None and not self.sampler.keep(event):
+            if self.global_writes is not None and self._may_rebind_globals(co):
+                self._globals_dirty = True
+            self._pending = None
+            if profiler is not None:
+                profiler.resume()
+            return
 
         func_name = co.co_name
 
-        stack = []
-        f = frame
-        while f:
-            if f.f_code.co_filename == "<string>":
-                name = f.f_code.co_name
-                if name != "<module>":
-                    stack.append({"name": name, "frame_id": id(f)})
-            f = f.f_back
-        stack.reverse()
-
-        local_vars = {}
-        for k, v in frame.f_locals.items():
-            if k.startswith("__"):
-                continue
-            local_vars[k] = self.serializer.serialize(v)
+        stack = self._stack
+        if func_name != "<module>":
+            if event == "call":
+                stack = stack.push(func_name, id(frame))
+            elif stack.frame_id != id(frame):
+                # pushes and pops got out of step (e.g. tracing started
+                # inside a call); resync from the frame chain
+                stack = self._walk_stack(frame)
+            self._stack = stack.parent if event == "return" else stack
+        elif stack.depth:
+            # back in the module after returns that were out of scope
+            stack = self._stack = EMPTY_STACK
+        if stats is not None:
+            stats.mark()
 
-        global_vars = {}
-        for k, v in frame.f_globals.items():
-            if k.startswith("__"):
-                continue
-            if k == "CodeVisualizer" or k == "Executor":
-                continue
-            if isinstance(v, types.ModuleType):
-                continue
-            global_vars[k] = self.serializer.serialize(v)
+        clean = self._identity and self._unchanged_since_last_step()
+        local_items = [
+            (k, v) for k, v in frame.f_locals.items() if not k.startswith("__")
+        ]
+        local_vars, locals_delta = self._snapshot(
+            local_items, self._last_locals, self._last_local_objects if clean else None
+        )
+        if self._identity:
+            self._last_local_objects = dict(local_items)
+        if stats is not None:
+            stats.mark()
 
-        current_out = self.stdout_buffer.getvalue() if self.stdout_buffer else ""
+        refreshed = None
+        if self.global_writes is not None:
+            if not self._globals_dirty:
+                if clean:
+                    refreshed = self._last_globals, StateDelta({})
+                else:
+                    refreshed = self._refresh_globals(frame.f_globals)
+            # code running until the next event: this frame, or its
+            # caller once it returned
+            running = frame.f_back if event == "return" else frame
+            self._globals_dirty = running is None or self._may_rebind_globals(running.f_code)
+        if refreshed is not None:
+            global_vars, globals_delta = refreshed
+        else:
+            global_items = [
+                (k, v)
+                for k, v in frame.f_globals.items()
+                if not k.startswith("__")
+                and k != "CodeVisualizer"
+                and k != "Executor"
+                and not isinstance(v, types.ModuleType)
+            ]
+            global_vars, globals_delta = self._snapshot(
+                global_items, self._last_globals, self._last_global_objects if clean else None
+            )
+            if self._identity:
+                self._last_global_objects = dict(global_items)
+            if self.global_writes is not None:
+                is_frozen = self.serializer.is_frozen
+                self._mutable_globals = [
+                    k
+                    for k, v in global_items
+                    if type(v) not in _STABLE and not (type(v) in (tuple, frozenset) and is_frozen(v))
+                ]
+        if stats is not None:
+            stats.mark()
 
         exception_info = None
         if event == "exception":
             exc_type, exc_value, tb = arg
             exception_info = {"type": exc_type.__name__, "message": str(exc_value)}
 
+        index = len(self.trace_data)
+        is_keyframe = index % self.keyframe_interval == 0
+
         state = ExecutionState(
             line_number=line_no,
             event=event,
             func_name=func_name,
             stack=stack,
-            locals=local_vars,
-            globals=global_vars,
-            stdout=current_out,
+            locals_delta=locals_delta,
+            globals_delta=globals_delta,
+            stdout_offset=self.stdout_buffer.tell(),
             exception=exception_info,
             line_count=self.line_counts.get(line_no, 0),
+            locals=local_vars if is_keyframe else None,
+            globals=global_vars if is_keyframe else None,
+            elided=self.sampler.take_elided() if self.sampler is not None else 0,
         )
+        if state.elided and self.sampled_from is None:
+            self.sampled_from = index
+        state.index = index
+        state.owner = self
+        if stats is not None:
+            stats.mark()
 
+        self._last_locals = local_vars
+        self._last_globals = global_vars
+        if self._identity:
+            # nothing runs between a call event and the function's first line
+            self._pending = (
+                self._effects(co).get(line_no) if event == "line"
+                else _NO_NAMES if event == "call" else None
+            )
         self.trace_data.append(state)
-        
+        if stats is not None:
+            stats.mark()
+
         if self.on_step:
             self.on_step(state)
+        if stats is not None:
+            stats.end()
+        if profiler is not None:
+            profiler.resume()
         self.step_count += 1
         if self.step_count >= self.max_steps:
             self.limit_reached = True
@@ -120,13 +577,410 @@ class Tracer:
                 f"Execution stopped after {self.max_steps} steps."
             )
 
-        return self.trace
+    @staticmethod
+    def _share_stack(stack, prev):
+        if stack == prev:
+            return prev
+        if prev.depth and stack == prev.parent:
+            return prev.parent
+        if stack.depth and stack.parent == prev:
+            return prev.push(stack.name, stack.frame_id)
+        return stack
+
+    @staticmethod
+    def _walk_stack(frame):
+        frames = []
+        f = frame
+        while f:
+            if f.f_code.co_filename == "<string>":
+                name = f.f_code.co_name
+                if name != "<module>":
+                    frames.append((name, id(f)))
+            f = f.f_back
+        frames.reverse()
+        return _rebuild_stack(frames)
+
+    def _snapshot(self, items, last_vars, last_objects=None):
+        """Serialized snapshot of `items` and its delta from `last_vars`.
+
+        The serializer session hands back the same payload while an
+        object's fingerprint is unchanged, so the delta compares payloads
+        by identity (scalars by value). Given `last_objects` (the values
+        `last_vars` was taken from, none of which can have changed since),
+        a name still bound to the same object reuses its payload unread."""
+        serialize = self.serializer.serialize
+        snapshot = {}
+        changed = {}
+        calls = 0
+        for k, v in items:
+            if last_objects is not None and last_objects.get(k, _MISSING) is v:
+                snapshot[k] = last_vars[k]
+                continue
+            calls += 1
+            payload = serialize(v)
+            prev = last_vars.get(k, _MISSING)
+            if payload is prev or (type(payload) is type(prev) and type(payload) in _PLAIN and payload == prev):
+                snapshot[k] = prev
+                continue
+            snapshot[k] = changed[k] = payload
+        removed = tuple(k for k in last_vars if k not in snapshot)
+        if self._stats is not None:
+            self._stats.serializer_calls += calls
+        return snapshot, StateDelta(changed, removed, StateDelta.key_order(last_vars, snapshot, removed))
+
+    def _unchanged_since_last_step(self):
+        """True if the code run since the last step cannot have changed
+        any object that step saw."""
+        pending = self._pending
+        if pending is None:
+            return False
+        for name in pending:
+            old = self._last_local_objects.get(name, self._last_global_objects.get(name))
+            if type(old) not in _IMMUTABLE:
+                return False
+        return True
+
+    def _effects(self, code):
+        """{line: None if it may change objects, else the names its inplace
+        operators store to} for the lines of `code`."""
+        effects = self._line_effects.get(code)
+        if effects is not None:
+            return effects
+        impure, inplace, stores = set(), set(), {}
+        for ins in dis.get_instructions(code):
+            line = ins.positions.lineno if ins.positions is not None else None
+            if line is None:
+                continue
+            op = ins.opname
+            if op not in _PURE_OPS or ins.argrepr == "[]":
+                impure.add(line)
+            elif op == "BINARY_OP" and ins.argrepr.endswith("="):
+                inplace.add(line)
+            elif op.startswith("STORE_"):
+                names = ins.argval if isinstance(ins.argval, tuple) else (ins.argval,)
+                stores.setdefault(line, set()).update(names)
+            stores.setdefault(line, set())
+        effects = self._line_effects[code] = {
+            line: None if line in impure else frozenset(names) if line in inplace else _NO_NAMES
+            for line, names in stores.items()
+        }
+        return effects
+
+    def _may_rebind_globals(self, code):
+        rebinds = self._rebinds_globals.get(code)
+        if rebinds is None:
+            rebinds = self._rebinds_globals[code] = (
+                code.co_name == "<module>" or not self.global_writes.isdisjoint(code.co_names)
+            )
+        return rebinds
+
+    def _refresh_globals(self, f_globals):
+        """Snapshot of globals none of which can have been rebound since
+        the last one: only mutable values are serialized again (cheap while
+        their fingerprint is unchanged). None if a name went missing."""
+        last = self._last_globals
+        serialize = self.serializer.serialize
+        changed = {}
+        for k in self._mutable_globals:
+            v = f_globals.get(k, _MISSING)
+            if v is _MISSING:
+                return None
+            payload = serialize(v)
+            prev = last[k]
+            if payload is prev:
+                continue
+            changed[k] = payload
+        if self._stats is not None:
+            self._stats.serializer_calls += len(self._mutable_globals)
+        if not changed:
+            return last, StateDelta({})
+        snapshot = dict(last)
+        snapshot.update(changed)
+        return snapshot, StateDelta(changed)
 
     def refresh_stdout(self):
-        if self.trace_data and self.stdout_buffer and self.on_step:
+        if self.trace_data and self.on_step:
             state = self.trace_data[-1]
-            state.stdout = self.stdout_buffer.getvalue()
+            state.stdout_offset = self.stdout_buffer.tell()
             self.on_step(state)
 
+    def adopt(self, state):
+        """Append a step recorded by another tracer (e.g. in a worker
+        process). A step that is already known only updates its stdout
+        offset, mirroring refresh_stdout."""
+        if state.index < len(self.trace_data):
+            existing = self.trace_data[state.index]
+            existing.stdout_offset = state.stdout_offset
+            # a spilled step is a copy read back from disk
+            self.trace_data.replace(state.index, existing)
+            if self.on_step:
+                self.on_step(existing)
+            return
+
+        state.owner = self
+        if self.trace_data:
+            # steps arrive with their own copy of the stack; link it back
+            # to the previous step's nodes
+            state.stack = self._share_stack(state.stack, self.trace_data[-1].stack)
+        if state.event == "line":
+            self.line_counts[state.line_number] = state.line_count
+        if state.elided and self.sampled_from is None:
+            self.sampled_from = state.index
+        self.trace_data.append(state)
+        self.step_count += 1
+        if self.on_step:
+            self.on_step(state)
+
+    def append_stdout(self, text):
+        self.stdout_buffer.write(text)
+
+    def erase_stdout(self, count=1):
+        """Drop the last `count` characters (used while editing input)."""
+        end = self.stdout_buffer.tell()
+        self.stdout_buffer.truncate(max(0, end - count))
+        self.stdout_buffer.seek(max(0, end - count))
+        self._stdout_erasures += 1
+
+    def get_stdout(self, offset=None):
+        # Appends only grow the log, so (end, erasures) identifies its content
+        key = (self.stdout_buffer.tell(), self._stdout_erasures)
+        if self._stdout_cache[0] != key:
+            self._stdout_cache = (key, self.stdout_buffer.getvalue())
+        text = self._stdout_cache[1]
+        return text if offset is None else text[:offset]
+
     def get_trace(self):
         return self.trace_data
+
+    def stats(self):
+        """Tracer self-timing histograms and counters (see core.stats), or
+        None unless created with ``stats=True``."""
+        if self._stats is None:
+            return None
+        return self._stats.report(self)
+
+    def get_profile(self):
+        """Per-line / per-function timings (see LineProfiler.report()), or
+        None unless created with ``profile=True``."""
+        if self.profile is not None or self.profiler is None:
+            return self.profile
+        return self.profiler.report()
+
+    def get_state(self, index):
+        """Return step `index` with full locals/globals rebuilt from the
+        nearest keyframe (or from the previously rebuilt step)."""
+        if index < 0:
+            index += len(self.trace_data)
+        state = self.trace_data[index]
+        if state.is_keyframe:
+            return state
+
+        cursor = self._cursor
+        if cursor is not None and cursor.index == index:
+            return cursor
+
+        start = index
+        while not self.trace_data[start].is_keyframe:
+            start -= 1
+
+        if cursor is not None and start <= cursor.index < index:
+            start = cursor.index
+            local_vars, global_vars = cursor.locals, cursor.globals
+        else:
+            keyframe = self.trace_data[start]
+            local_vars, global_vars = keyframe.locals, keyframe.globals
+
+        for step in self.trace_data[start + 1 : index + 1]:
+            local_vars = step.locals_delta.apply(local_vars)
+            global_vars = step.globals_delta.apply(global_vars)
+
+        self._cursor = ExecutionState(
+            line_number=state.line_number,
+            event=state.event,
+            func_name=state.func_name,
+            stack=state.stack,
+            locals_delta=state.locals_delta,
+            globals_delta=state.globals_delta,
+            stdout_offset=state.stdout_offset,
+            exception=state.exception,
+            line_count=state.line_count,
+            locals=local_vars,
+            globals=global_vars,
+            elided=state.elided,
+        )
+        self._cursor.index = index
+        self._cursor.owner = self
+        return self._cursor
+
+
+class MonitoringTracer(Tracer):
+    """Tracer backend built on sys.monitoring (PEP 669).
+
+    Line/start/return events are enabled only on the code objects compiled
+    from the user's program, so library code runs without any callback at all.
+    """
+
+    TOOL_NAME = "python-execution-visualizer"
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._tool_id = None
+        self._code_objects = set()
+        self._offset_lines = {}
+
+    @staticmethod
+    def is_available():
+        monitoring = getattr(sys, "monitoring", None)
+        return (
+            monitoring is not None
+            and monitoring.get_tool(monitoring.DEBUGGER_ID) is None
+        )
+
+    def start(self, code):
+        monitoring = sys.monitoring
+        events = monitoring.events
+        tool_id = monitoring.DEBUGGER_ID
+
+        monitoring.use_tool_id(tool_id, self.TOOL_NAME)
+        self._tool_id = tool_id
+
+        self._code_objects = set(self._walk_code(code))
+        scope = self.scope
+        if scope is not None and not scope.count_excluded:
+            # out-of-scope functions are not monitored at all
+            self._code_objects = {
+                co for co in self._code_objects if scope.traces_function(co.co_name)
+            }
+        self._offset_lines = {
+            co: {
+                offset: line
+                for start, end, line in co.co_lines()
+                for offset in range(start, end, 2)
+            }
+            for co in self._code_objects
+        }
+
+        callbacks = {
+            events.PY_START: self._on_start,
+            events.PY_RESUME: self._on_start,
+            events.LINE: self._on_line,
+            events.JUMP: self._on_jump,
+            events.PY_RETURN: self._on_return,
+            events.PY_YIELD: self._on_return,
+            events.PY_UNWIND: self._on_unwind,
+            events.RAISE: self._on_raise,
+        }
+        for event, callback in callbacks.items():
+            monitoring.register_callback(tool_id, event, callback)
+
+        local_events = (
+            events.PY_START
+            | events.PY_RESUME
+            | events.LINE
+            | events.JUMP
+            | events.PY_RETURN
+            | events.PY_YIELD
+        )
+        for co in self._code_objects:
+            monitoring.set_local_events(tool_id, co, local_events)
+
+        # RAISE and PY_UNWIND can only be enabled globally; the callbacks
+        # filter them down to the user's code objects.
+        monitoring.set_events(tool_id, events.RAISE | events.PY_UNWIND)
+
+    def stop(self):
+        if self._tool_id is None:
+            return
+
+        if self.profiler is not None:
+            self.profiler.finish()
+        monitoring = sys.monitoring
+        monitoring.set_events(self._tool_id, 0)
+        for co in self._code_objects:
+            monitoring.set_local_events(self._tool_id, co, 0)
+        for event in (
+            monitoring.events.PY_START,
+            monitoring.events.PY_RESUME,
+            monitoring.events.LINE,
+            monitoring.events.JUMP,
+            monitoring.events.PY_RETURN,
+            monitoring.events.PY_YIELD,
+            monitoring.events.PY_UNWIND,
+            monitoring.events.RAISE,
+        ):
+            monitoring.register_callback(self._tool_id, event, None)
+        monitoring.free_tool_id(self._tool_id)
+
+        self._tool_id = None
+        self._code_objects = set()
+        self._offset_lines = {}
+
+    def _walk_code(self, code):
+        yield code
+        for const in code.co_consts:
+            if isinstance(const, types.CodeType):
+                yield from self._walk_code(const)
+
+    def _filtered(self):
+        if self._stats is not None:
+            self._stats.events_seen += 1
+            self._stats.events_filtered += 1
+        return sys.monitoring.DISABLE
+
+    def _dispatch(self, code, event, arg=None):
+        if code not in self._code_objects:
+            return self._filtered()
+        if self._stats is not None:
+            self._stats.events_seen += 1
+
+        self._check_limits()
+        # frame of the user code that triggered the callback
+        frame = sys._getframe(2)
+        scope = self.scope
+        if scope is not None and not scope.traces(code.co_name, frame.f_lineno):
+            if not scope.count_excluded:
+                # nothing here will be recorded again
+                return sys.monitoring.DISABLE
+            if event == "line":
+                self._count_line(frame.f_lineno)
+            return None
+        self._record(frame, event, arg)
+
+    def _on_start(self, code, instruction_offset):
+        return self._dispatch(code, "call")
+
+    def _on_line(self, code, line_number):
+        return self._dispatch(code, "line")
+
+    def _on_jump(self, code, instruction_offset, destination_offset):
+        # LINE only fires when the line number changes; settrace also reports
+        # a line event for backward jumps within one line (comprehensions,
+        # one-line loops), so replay those here. Forward jumps are disabled,
+        # backward ones never are: in `while True: pass` (a jump from an
+        # offset to itself) they are the only event left to stop the loop.
+        lines = self._offset_lines.get(code)
+        if lines is None or destination_offset > instruction_offset:
+            return self._filtered()
+        if lines.get(destination_offset) != lines.get(instruction_offset):
+            if self._stats is not None:
+                self._stats.events_seen += 1
+                self._stats.events_filtered += 1
+            return None
+        self._dispatch(code, "line")
+        return None
+
+    def _on_return(self, code, instruction_offset, retval):
+        return self._dispatch(code, "return", retval)
+
+    def _on_unwind(self, code, instruction_offset, exception):
+        if code in self._code_objects:
+            self._dispatch(code, "return")
+        else:
+            self._filtered()
+
+    def _on_raise(self, code, instruction_offset, exception):
+        if code in self._code_objects:
+            exc_info = (type(exception), exception, exception.__traceback__)
+            self._dispatch(code, "exception", exc_info)
+        else:
+            self._filtered()
@@ -0,0 +1,339 @@
+"""Out-of-process execution: a pool of pre-started tracer worker processes.
+
+Each worker is a ``python -m core.worker`` child that has already imported
+the tracer and serializer, so a run only pays for the user's own code. The
+parent and the worker exchange pickled messages over the child's
+stdin/stdout pipes:
+
+    parent -> worker  ("run", code, inputs, timeout, max_steps, backend, stats, profile,
+                       scope, sample_after, sample_target)
+                      ("input", value)
+                      ("batch", code, inputs, timeout, max_steps, backend, profile)
+    worker -> parent  ("ready",)
+                      ("step", state, stdout_chunk)
+                      ("input",)
+                      ("done", counts, profile, stats, limit_reached, error, stdout_chunk,
+                       reusable)
+                      ("result", summary, reusable)
+
+A "batch" run is non-interactive and streams nothing: the worker traces the
+program on its own and only sends back a summary (see core.batch).
+
+The parent side turns a closed pipe into an ("exit",) message.
+
+Heap payloads shared between steps (see SerializerSession) are written
+once per run; every later occurrence is pickled as a ("heap", key) stub
+that the parent resolves to the payload it already received.
+"""
+
+import io
+import os
+import pickle
+import queue
+import subprocess
+import sys
+import threading
+
+from core.executor import Executor
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+class _HeapPickler(pickle.Pickler):
+    def __init__(self, file):
+        super().__init__(file)
+        self._file = file
+        # id -> payload; holding the payload keeps its id from being reused
+        self._sent = {}
+        self._defining = set()
+
+    def persistent_id(self, obj):
+        if type(obj) is not dict or "__ref__" not in obj:
+            return None
+        key = id(obj)
+        if key in self._defining:
+            # the payload itself, inside its own definition
+            self._defining.discard(key)
+            return None
+        if key in self._sent:
+            return ("heap", key)
+        self._sent[key] = obj
+        self._defining.add(key)
+        return ("heap", key, obj)
+
+    def send(self, msg):
+        self.dump(msg)
+        # steps are re-sent after their stdout offset changes, so nothing
+        # but heap payloads may be shared between messages
+        self.clear_memo()
+        self._file.flush()
+        if msg[0] == "done":
+            self._sent.clear()
+
+
+class _HeapUnpickler(pickle.Unpickler):
+    def __init__(self, file, heap):
+        super().__init__(file)
+        self._heap = heap
+
+    def persistent_load(self, pid):
+        if len(pid) == 3:
+            self._heap[pid[1]] = pid[2]
+        return self._heap[pid[1]]
+
+
+def _receive(file, heap):
+    # a fresh unpickler per message, matching clear_memo() on the sender
+    msg = _HeapUnpickler(file, heap).load()
+    if msg[0] == "done":
+        heap.clear()
+    return msg
+
+
+class Worker:
+    def __init__(self):
+        env = os.environ.copy()
+        env["PYTHONPATH"] = os.pathsep.join(
+            p for p in (PROJECT_ROOT, env.get("PYTHONPATH")) if p
+        )
+        self.process = subprocess.Popen(
+            [sys.executable, "-m", "core.worker"],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            env=env,
+        )
+        self.messages = queue.Queue()
+        self.ready = threading.Event()
+        self._reader = threading.Thread(target=self._read_messages, daemon=True)
+        self._reader.start()
+
+    def _read_messages(self):
+        heap = {}
+        try:
+            while True:
+                msg = _receive(self.process.stdout, heap)
+                if msg[0] == "ready":
+                    self.ready.set()
+                else:
+                    self.messages.put(msg)
+        except (EOFError, OSError, ValueError, pickle.UnpicklingError):
+            self.messages.put(("exit",))
+            self.ready.set()  # never leave acquire() waiting on a dead worker
+            self.process.stdout.close()
+
+    def is_alive(self):
+        return self.process.poll() is None
+
+    def send(self, msg):
+        try:
+            pickle.dump(msg, self.process.stdin)
+            self.process.stdin.flush()
+        except (BrokenPipeError, OSError):
+            pass
+
+    def reset(self):
+        while True:
+            try:
+                self.messages.get_nowait()
+            except queue.Empty:
+                return
+
+    def kill(self):
+        if self.is_alive():
+            self.process.kill()
+        self.process.wait()
+        # stdout is closed by the reader thread once it sees EOF
+        try:
+            self.process.stdin.close()
+        except OSError:
+            pass
+
+
+class WorkerPool:
+    """Keeps `size` idle workers warm and replaces killed ones."""
+
+    def __init__(self, size=1):
+        self.size = size
+        self._idle = queue.Queue()
+        self._lock = threading.Lock()
+        self._closed = False
+        for _ in range(size):
+            self._idle.put(Worker())
+
+    def acquire(self):
+        while True:
+            try:
+                worker = self._idle.get_nowait()
+            except queue.Empty:
+                worker = Worker()
+            if worker.is_alive():
+                worker.ready.wait()
+                return worker
+            worker.kill()
+
+    def release(self, worker):
+        with self._lock:
+            if self._closed or not worker.is_alive():
+                worker.kill()
+                return
+            worker.reset()
+            self._idle.put(worker)
+
+    def discard(self, worker):
+        worker.kill()
+        with self._lock:
+            if not self._closed and self._idle.qsize() < self.size:
+                self._idle.put(Worker())
+
+    def shutdown(self):
+        with self._lock:
+            self._closed = True
+        while True:
+            try:
+                self._idle.get_nowait().kill()
+            except queue.Empty:
+                return
+
+
+class _PipeLog(io.StringIO):
+    """Stdout log that remembers what has not been sent to the parent yet."""
+
+    def __init__(self):
+        super().__init__()
+        self._pending = []
+
+    def write(self, text):
+        self._pending.append(text)
+        return super().write(text)
+
+    def take_pending(self):
+        chunk = "".join(self._pending)
+        self._pending = []
+        return chunk
+
+
+class _WorkerExecutor(Executor):
+    def __init__(self, channel_in, channel_out, **kwargs):
+        super().__init__(on_step=self._send_step, **kwargs)
+        self._channel_in = channel_in
+        self._channel_out = channel_out
+
+    def send(self, msg):
+        self._channel_out.send(msg)
+
+    def _create_stdout(self):
+        return _PipeLog()
+
+    def _send_step(self, state):
+        self.send(("step", state, self.tracer.stdout_buffer.take_pending()))
+
+    def _receive_input(self):
+        self.send(("input",))
+        msg = pickle.load(self._channel_in)
+        value = msg[1]
+        # the parent dropped its local echo, so the value is logged here
+        self.tracer.append_stdout(value)
+        return value
+
+
+def _run_batch_job(channel_out, code, inputs, timeout, max_steps, backend, profile):
+    executor = Executor(
+        code=code,
+        inputs=inputs,
+        timeout=timeout,
+        max_steps=max_steps,
+        backend=backend,
+        interactive=False,
+        profile=profile,
+    )
+    summary = {"steps": 0, "stdout": "", "counts": {}, "profile": None, "limit_reached": False}
+    try:
+        result = executor.execute()
+        summary.update(
+            steps=len(result["steps"]),
+            counts=result["counts"],
+            profile=result["profile"],
+            limit_reached=result["limit_reached"],
+            error=result["error"],
+        )
+    except Exception as e:
+        summary["error"] = f"{type(e).__name__}: {str(e)}"
+    if executor.tracer is not None:
+        summary["stdout"] = executor.tracer.get_stdout()
+
+    abandoned = executor._run_thread is not None and executor._run_thread.is_alive()
+    channel_out.send(("result", summary, not abandoned))
+    if abandoned:
+        os._exit(0)
+
+
+def serve():
+    # Keep the protocol on private copies of stdin/stdout so neither the
+    # user's program nor C extensions writing to fd 0/1 can corrupt it.
+    channel_in = os.fdopen(os.dup(0), "rb")
+    channel_out = _HeapPickler(os.fdopen(os.dup(1), "wb"))
+    devnull = os.open(os.devnull, os.O_RDWR)
+    os.dup2(devnull, 0)
+    os.dup2(devnull, 1)
+    sys.stdin = open(os.devnull, "r")
+    sys.stdout = open(os.devnull, "w")
+
+    channel_out.send(("ready",))
+
+    while True:
+        try:
+            msg = pickle.load(channel_in)
+        except EOFError:
+            return
+        if msg[0] == "batch":
+            _run_batch_job(channel_out, *msg[1:])
+            continue
+        if msg[0] != "run":
+            continue
+
+        (_, code, inputs, timeout, max_steps, backend, stats, profile, scope,
+         sample_after, sample_target) = msg
+        executor = _WorkerExecutor(
+            channel_in,
+            channel_out,
+            code=code,
+            inputs=inputs,
+            timeout=timeout,
+            max_steps=max_steps,
+            backend=backend,
+            stats=stats,
+            profile=profile,
+            scope=scope,
+            sample_after=sample_after,
+            sample_target=sample_target,
+        )
+        try:
+            result = executor.execute()
+            error = result["error"]
+            counts = result["counts"]
+            profile = result["profile"]
+            stats = result["stats"]
+            limit_reached = result["limit_reached"]
+        except Exception as e:
+            error = f"{type(e).__name__}: {str(e)}"
+            counts = executor.tracer.line_counts if executor.tracer else {}
+            profile = executor.tracer.get_profile() if executor.tracer else None
+            stats = executor.tracer.stats() if executor.tracer else None
+            limit_reached = False
+
+        # output written after the last step goes with the last step, and
+        # whatever is left (all of it when no step was recorded) with "done"
+        chunk = ""
+        if executor.tracer is not None:
+            executor.tracer.refresh_stdout()
+            chunk = executor.tracer.stdout_buffer.take_pending()
+        # a timed-out run leaves its thread spinning; never reuse this process
+        abandoned = executor._run_thread is not None and executor._run_thread.is_alive()
+        executor.send(("done", counts, profile, stats, limit_reached, error, chunk, not abandoned))
+        if abandoned:
+            os._exit(0)
+        executor.close()
+
+
+if __name__ == "__main__":
+    serve()
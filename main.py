@@ -2,8 +2,10 @@ import threading
 
 from kivy.clock import Clock, mainthread
 from kivy.core.window import Window
-from kivy.graphics import Color, Line
+from kivy.graphics import Color, Line, Rectangle
 from kivy.lang import Builder
+from kivy.metrics import dp
+from kivy.uix.label import Label
 from kivy.utils import escape_markup, get_color_from_hex
 from kivymd.app import MDApp
 from kivymd.uix.boxlayout import MDBoxLayout
@@ -11,7 +13,10 @@ from kivymd.uix.menu import MDDropdownMenu
 
 from core.examples import EXAMPLES
 from core.executor import Executor
+from core.tracefile import SUFFIX as TRACE_SUFFIX, TraceFile, load_trace, write_trace
+from core.tracer import StepBatcher
 from core.terminal import InteractiveTerminal
+from core.worker import WorkerPool
 from plyer import filechooser
 from kivy.core.clipboard import Clipboard
 
@@ -27,18 +32,46 @@ FONT_SIZE_DEFAULT_TERMINAL = 13
 FONT_SIZE_MIN = 8
 FONT_SIZE_MAX = 32
 
+# heat gutter: line numbers fade from the default gutter grey through
+# orange to red by their share of the run's time
+HEAT_STOPS = ("#6e7681", "#e5a33b", "#ff5555")
+
+
+def heat_color(share):
+    """Hex color for a line that took `share` (0..1) of the hottest line's time."""
+    share = max(0.0, min(1.0, share))
+    low, high = (HEAT_STOPS[0], HEAT_STOPS[1]) if share < 0.5 else (HEAT_STOPS[1], HEAT_STOPS[2])
+    t = share * 2 if share < 0.5 else share * 2 - 1
+    a, b = get_color_from_hex(low), get_color_from_hex(high)
+    return "#" + "".join(f"{round((x + (y - x) * t) * 255):02x}" for x, y in zip(a[:3], b[:3]))
+
 
 class RootLayout(MDBoxLayout):
     def __init__(self, **kwargs):
         super().__init__(**kwargs)
+        # the running tracer's TraceStore once steps arrive
         self.trace_data = []
+        self._executor = None  # the run behind trace_data, if any
+        self._run_done = False  # its result has been shown
+        self._steps_received = 0
+        self._first_step_rendered = False
         self.current_step = 0
         self.is_playing = False
         self._original_code = ""
+        self._trace_heat = {}  # line -> gutter color, once a run is profiled
+        # runs are only profiled (which slows tracing) while the heat
+        # gutter is on; `_profile` is the current trace's timings, if any
+        self.show_heat = False
+        self._profile = None
+        self._trace_marked_line = None
+        self._trace_line_total = 0
         self.play_event = None
         self._examples_menu = None
         self.current_file_path = None
         self.execution_finished = False
+        self._run_error = None
+        # first step of the sampled part of the trace (None: every step kept)
+        self._sampled_from = None
 
         # Font size state
         self._editor_font_size = FONT_SIZE_DEFAULT_EDITOR
@@ -67,6 +100,11 @@ class RootLayout(MDBoxLayout):
             self.toggle_panel("editor")
             return True
 
+        # Ctrl+E → export the finished trace
+        if key == ord("e") and "ctrl" in modifiers:
+            self.export_trace()
+            return True
+
         # Ctrl+R → restart terminal
         if key == ord("r") and "ctrl" in modifiers:
             self.restart_terminal()
@@ -129,6 +167,11 @@ class RootLayout(MDBoxLayout):
         self._terminal_focus_color = None
         self._terminal_focus_line = None
         self._setup_focus_borders()
+        self._setup_trace_highlight()
+        self._setup_sampling_band()
+
+        # Pre-start a tracer worker so Run doesn't pay for process startup
+        self._worker_pool = WorkerPool(size=1)
 
         # Start the backend shell process
         self.ids.terminal_display.start_shell()
@@ -177,6 +220,12 @@ class RootLayout(MDBoxLayout):
         if not selection:
             return
         path = selection[0]
+        if path.endswith(TRACE_SUFFIX):
+            try:
+                self.open_trace(path)
+            except Exception as e:
+                self._on_execution_error(f"Failed to open trace: {e}")
+            return
         try:
             with open(path, "r", encoding="utf-8") as f:
                 code = f.read()
@@ -238,6 +287,61 @@ class RootLayout(MDBoxLayout):
             size=self._update_terminal_border,
         )
 
+    def _setup_trace_highlight(self):
+        # Current-line bar drawn behind the code label, so moving it never
+        # re-renders the code texture
+        code = self.ids.code_display
+        with code.canvas.before:
+            self._trace_highlight_color = Color(0, 0, 0, 0)
+            self._trace_highlight_rect = Rectangle(pos=code.pos, size=(0, 0))
+        code.bind(
+            pos=self._place_trace_highlight,
+            size=self._place_trace_highlight,
+            texture_size=self._place_trace_highlight,
+        )
+
+        # Arrow and hit-count badge: a one-row label laid over the gutter,
+        # so a step only re-renders this row and never the gutter text
+        gutter = self.ids.trace_line_numbers
+        self._trace_marker = Label(
+            markup=True,
+            font_name=gutter.font_name,
+            font_size=gutter.font_size,
+            halign="right",
+            valign="middle",
+            padding=[0, 0, gutter.padding[2], 0],
+            size_hint=(None, None),
+            opacity=0,
+        )
+        self._trace_marker.bind(texture_size=self._place_trace_marker)
+        gutter.add_widget(self._trace_marker)
+        gutter.bind(
+            pos=self._place_trace_marker,
+            size=self._place_trace_marker,
+            texture_size=self._place_trace_marker,
+        )
+
+    def _setup_sampling_band(self):
+        # Band under the scrubber track over the steps recorded in sampling
+        # mode, where line events between two steps were dropped
+        scrubber = self.ids.step_scrubber
+        with scrubber.canvas.before:
+            Color(*get_color_from_hex("#e5a33b66"))
+            self._sampling_band = Rectangle(pos=scrubber.pos, size=(0, 0))
+        scrubber.bind(pos=self._place_sampling_band, size=self._place_sampling_band)
+
+    def _place_sampling_band(self, *args):
+        scrubber = self.ids.step_scrubber
+        start = self._sampled_from
+        if start is None or scrubber.max <= 0:
+            self._sampling_band.size = (0, 0)
+            return
+        track_x = scrubber.x + scrubber.padding
+        track_w = scrubber.width - 2 * scrubber.padding
+        x = track_x + track_w * min(1.0, start / scrubber.max)
+        self._sampling_band.pos = (x, scrubber.center_y - dp(6))
+        self._sampling_band.size = (track_x + track_w - x, dp(3))
+
     def _update_editor_border(self, instance, _value):
         if self._editor_focus_line:
             self._editor_focus_line.rectangle = (
@@ -322,11 +426,14 @@ class RootLayout(MDBoxLayout):
             if self.is_playing:
                 self.toggle_play(None)
 
+            self._close_trace()
             self.trace_data = []
+            self._sampled_from = None
             self.ids.step_scrubber.max = 1
             self.ids.step_scrubber.value = 0
             self.ids.step_scrubber.disabled = True
             self.ids.step_label.text = "0 / 0"
+            self._place_sampling_band()
             self.ids.error_banner.height = "0dp"
             self.ids.error_banner.text = ""
             return
@@ -335,13 +442,39 @@ class RootLayout(MDBoxLayout):
         if not code.strip():
             return
 
+        self._enter_trace_view(code)
+        self._executor = Executor(
+            code=code, 
+            timeout=60.0,
+            # older steps spill to disk, so long runs are only bounded by time
+            max_steps=1_000_000,
+            # past 20k events, thin out line steps towards ~200k in total
+            sample_after=20_000,
+            sample_target=200_000,
+            profile=self.show_heat,
+            pool=self._worker_pool,
+            on_step=StepBatcher(self._on_new_step, Clock.schedule_once),
+        )
+        self._run_done = False
+        # Register executor with terminal so we can type stuff in matching input()
+        self.ids.terminal_display.register_executor(self._executor)
+        threading.Thread(target=self._run_in_thread, args=(self._executor,), daemon=True).start()
+
+    def _enter_trace_view(self, code):
+        """Switch the editor into the read-only trace view for `code`."""
         if self.is_playing:
             self.toggle_play(None)
 
         self._original_code = code
+        self._close_trace()
         self.trace_data = []
+        self._steps_received = 0
+        self._sampled_from = None
+        self._place_sampling_band()
+        self._first_step_rendered = False
         self.current_step = 0
         self.execution_finished = False
+        self._run_error = None
 
         # Save current panel proportions so we can restore them after Stop Edit
         self._saved_panel_sizes = {
@@ -359,7 +492,7 @@ class RootLayout(MDBoxLayout):
         self.ids.trace_wrapper.opacity = 1
         self.ids.trace_wrapper.size_hint_y = 1
 
-        self._update_line_numbers(None, code, target=self.ids.trace_line_numbers)
+        self._prepare_code_trace(code)
 
         self.ids.terminal_display.stop_shell()
         self.ids.terminal_display.clear()
@@ -371,43 +504,102 @@ class RootLayout(MDBoxLayout):
 
         self.ids.btn_run_text.text = "Stop Edit"
         self.ids.btn_run_icon.icon = "stop-circle"
-        instance.md_bg_color = get_color_from_hex("#da3633")
+        self.ids.btn_run.md_bg_color = get_color_from_hex("#da3633")
 
-        threading.Thread(target=self._run_in_thread, args=(code,), daemon=True).start()
+    def _close_trace(self):
+        """Release the shown trace's files before it is replaced. A run
+        still going is stopped and closed once it has unwound."""
+        executor, self._executor = self._executor, None
+        if executor is not None and not self._run_done:
+            self.ids.terminal_display.unregister_executor()
+            executor.stop()
+        elif executor is not None:
+            executor.close()
+        elif isinstance(self.trace_data, TraceFile):
+            self.trace_data.close()
+
+    def open_trace(self, path):
+        """Replay a saved trace file without executing anything."""
+        tracer, code = load_trace(path)
+        self._enter_trace_view(code)
+        self.ids.terminal_display.output_text = ""
+        self.trace_data = tracer.trace_data
+        self._sampled_from = tracer.sampled_from
+        self._steps_received = len(self.trace_data)
+        self._run_error = tracer.trace_data.error
+        self.execution_finished = True
+        if not self.trace_data:
+            return
+        self.ids.step_scrubber.max = max(1, len(self.trace_data) - 1)
+        self.ids.step_scrubber.disabled = False
+        self._place_sampling_band()
+        self._first_step_rendered = True
+        self._profile = tracer.get_profile()
+        self._show_heat(self._profile)
+        self.render_step(0)
+        if self._run_error:
+            self.ids.terminal_display.output_text += f"\n{self._run_error}"
+
+    def export_trace(self, _caller=None):
+        if self.trace_data and self.execution_finished:
+            filechooser.save_file(on_selection=self._on_export_trace_selection)
+
+    def _on_export_trace_selection(self, selection):
+        if not selection:
+            return
+        path = selection[0]
+        if not path.endswith(TRACE_SUFFIX):
+            path += TRACE_SUFFIX
+        try:
+            write_trace(path, self.trace_data.owner, self._original_code, self._run_error)
+        except Exception as e:
+            self._on_execution_error(f"Failed to export trace: {e}")
 
-    def _run_in_thread(self, code):
+    def _run_in_thread(self, executor):
         try:
-            executor = Executor(
-                code=code, 
-                timeout=60.0,
-                on_step=lambda state: Clock.schedule_once(lambda dt: self._on_new_step(state))
-            )
-            # Register executor with terminal so we can type stuff in matching input()
-            self.ids.terminal_display.register_executor(executor)
             result = executor.execute()
-            self._on_execution_finished(result)
+            self._on_execution_finished(executor, result)
         except Exception as e:
-            self._on_execution_error(str(e))
+            self._on_execution_error(str(e), executor)
         finally:
-            self.ids.terminal_display.unregister_executor()
-
-    @mainthread
-    def _on_new_step(self, state):
-        """Called whenever a new execution step is captured."""
-        self.trace_data.append(state)
+            if executor is self._executor:
+                self.ids.terminal_display.unregister_executor()
+
+    def _on_new_step(self, states):
+        """Called once per frame with the steps captured since the last call."""
+        if self._executor is None or states[-1].owner is not self._executor.tracer:
+            return  # a replaced run's last frames
+        for state in states:
+            if state.index < self._steps_received:
+                # stdout refresh of a known step (prompt / typed input)
+                if state.index == self.current_step:
+                    self.ids.terminal_display.sync_with_stdout(state.stdout)
+                continue
+            self._steps_received = state.index + 1
+        # steps are read back through the tracer's store rather than kept
+        # in a second list here
+        self.trace_data = states[-1].owner.trace_data
+        self._sampled_from = states[-1].owner.sampled_from
         
         max_step = len(self.trace_data) - 1
         self.ids.step_scrubber.max = max(1, max_step)
         self.ids.step_scrubber.disabled = False
+        self._place_sampling_band()
         
-        if max_step == 0:
+        if self.trace_data and not self._first_step_rendered:
+            self._first_step_rendered = True
             self.render_step(0)
             if not self.is_playing:
                 self.toggle_play(None)
 
     @mainthread
-    def _on_execution_finished(self, result):
+    def _on_execution_finished(self, executor, result):
+        if executor is not self._executor:
+            executor.close()  # stopped by _close_trace
+            return
+        self._run_done = True
         self.execution_finished = True
+        self._run_error = result.get("error")
         if not self.trace_data:
             err = result.get("error", "Trace failed or no steps captured.")
             self.ids.terminal_display.output_text += f"\n{err}"
@@ -416,13 +608,23 @@ class RootLayout(MDBoxLayout):
         max_step = max(1, len(self.trace_data) - 1)
         self.ids.step_scrubber.max = max_step
         self.ids.step_scrubber.disabled = False
+        self._place_sampling_band()
+
+        self._profile = result.get("profile")
+        self._show_heat(self._profile)
+        self.render_step(self.current_step)
 
         # If there's an error at the end, show it
         if result.get("error"):
             self.ids.terminal_display.output_text += f"\n{result['error']}"
 
     @mainthread
-    def _on_execution_error(self, err_msg):
+    def _on_execution_error(self, err_msg, executor=None):
+        if executor is not None and executor is not self._executor:
+            executor.close()
+            return
+        if executor is not None:
+            self._run_done = True
         self.execution_finished = True
         self.ids.terminal_display.output_text = f"Execution Error: {err_msg}"
 
@@ -433,27 +635,28 @@ class RootLayout(MDBoxLayout):
         self.current_step = int(step_idx)
         state = self.trace_data[self.current_step]
 
-        self.ids.step_label.text = f"{self.current_step} / {len(self.trace_data) - 1}"
+        label = f"{self.current_step} / {len(self.trace_data) - 1}"
+        if state.elided:
+            # line events dropped by sampling before this step
+            label += f" (+{state.elided})"
+        self.ids.step_label.text = label
         if int(self.ids.step_scrubber.value) != self.current_step:
             self.ids.step_scrubber.value = self.current_step
 
         self._render_code_trace(state)
 
-        self._render_code_trace(state)
-
         # Trigger graph draw instead of text
-        prev_locals = None
-        prev_globals = None
+        changed_locals = None
+        changed_globals = None
         if self.current_step > 0:
-            prev_state = self.trace_data[self.current_step - 1]
-            prev_locals = prev_state.locals
-            prev_globals = prev_state.globals
+            changed_locals = state.locals_delta.changed.keys()
+            changed_globals = state.globals_delta.changed.keys()
             
         self.ids.data_graph_display.build_graph(
             state.locals, 
             state.globals, 
-            prev_local_vars=prev_locals, 
-            prev_global_vars=prev_globals
+            changed_locals=changed_locals, 
+            changed_globals=changed_globals
         )
 
         self._render_call_stack(state)
@@ -469,53 +672,118 @@ class RootLayout(MDBoxLayout):
             self.ids.error_banner.height = "0dp"
             self.ids.error_banner.text = ""
 
-    def _render_code_trace(self, state):
-        code_lines = self._original_code.split("\n")
-        rendered_code = ""
-        trace_nums = []
+    def _prepare_code_trace(self, code):
+        """Escapes the code and builds the default gutter once per run."""
+        display_text = escape_markup(code).rstrip("\n")
+        self._trace_line_total = display_text.count("\n") + 1
+        self._trace_heat = {}
+        self._profile = None
+        self._trace_marked_line = None
+        self._trace_highlight_color.rgba = (0, 0, 0, 0)
+        self._trace_marker.opacity = 0
+
+        self.ids.code_display.text = display_text
+        self._set_gutter()
+
+    def toggle_heat(self, button):
+        """Turn the heat gutter (and profiling of the next runs) on or off."""
+        self.show_heat = not self.show_heat
+        button.icon_color = get_color_from_hex(HEAT_STOPS[1] if self.show_heat else "#858585")
+        self._show_heat(self._profile)
+
+    def _show_heat(self, profile):
+        """Color the gutter's line numbers by each line's self time, or
+        restore the plain gutter while the heat gutter is off."""
+        lines = ((profile or {}).get("lines") or {}) if self.show_heat else {}
+        hottest = max((t["self_ns"] for t in lines.values()), default=0)
+        self._trace_heat = {
+            line: heat_color(t["self_ns"] / hottest)
+            for line, t in lines.items()
+            # lines under 1% keep the plain gutter color
+            if t["self_ns"] >= hottest / 100
+        }
+        self._set_gutter()
+
+    def _set_gutter(self):
+        """Line numbers (heat colored); only changes with the code or the
+        heat, never per step."""
+        rows = []
+        for line_no in range(1, self._trace_line_total + 1):
+            no_str = f"{line_no:3}".replace(" ", "\xa0")
+            heat = self._trace_heat.get(line_no)
+            if heat is not None:
+                no_str = f"[color={heat}]{no_str}[/color]"
+            rows.append(f"\xa0\xa0\xa0\xa0\xa0\xa0\xa0{no_str}")
+        self.ids.trace_line_numbers.text = "\n".join(rows)
+
+    def _marker_text(self, state):
+        badge = "\xa0\xa0\xa0\xa0" # default padding so numbers align
+        if state.line_count > 1:
+            # e.g., " 3x "
+            badge_str = f"{state.line_count}x".rjust(4).replace(" ", "\xa0")
+            badge = f"[size=10sp][color=#555555]{badge_str}[/color][/size]"
+        color = "#ff5555" if state.event == "exception" else "#a6e22e"
+        # blank where the gutter's line number shows through
+        return f"{badge}\xa0[color={color}]►[/color]\xa0\xa0\xa0\xa0"
 
-        for i, raw_line in enumerate(code_lines):
-            line_no = i + 1
-            safe_line = escape_markup(raw_line)
-            
-            badge = "\xa0\xa0\xa0\xa0" # default padding so numbers align
-            if hasattr(state, "line_count") and state.line_count > 1 and line_no == state.line_number:
-                # e.g., " 3x "
-                badge_str = f"{state.line_count}x".rjust(4).replace(" ", "\xa0")
-                badge = f"[size=10sp][color=#555555]{badge_str}[/color][/size]"
-
-            if line_no == state.line_number:
-                color = "#ff5555" if state.event == "exception" else "#a6e22e"
-                no_str = f"{line_no:3}".replace(" ", "\xa0")
-                trace_nums.append(f"{badge}\xa0[color={color}]►[/color]\xa0{no_str}")
-                rendered_code += f"[b][color={color}]{safe_line}[/color][/b]\n"
-            else:
-                no_str = f"{line_no:3}".replace(" ", "\xa0")
-                trace_nums.append(f"{badge}\xa0\xa0\xa0{no_str}")
-                rendered_code += f"{safe_line}\n"
+    def _render_code_trace(self, state):
+        if 1 <= state.line_number <= self._trace_line_total:
+            self._trace_marked_line = state.line_number
+            self._trace_marker.text = self._marker_text(state)
+        else:
+            self._trace_marked_line = None
+        self._place_trace_marker()
 
-        self.ids.code_display.text = rendered_code.rstrip("\n")
-        self.ids.trace_line_numbers.text = "\n".join(trace_nums)
+        color = get_color_from_hex("#ff5555" if state.event == "exception" else "#a6e22e")
+        self._trace_highlight_color.rgba = (color[0], color[1], color[2], 0.15)
+        self._place_trace_highlight()
 
         label_height = max(
             self.ids.code_display.texture_size[1],
             self.ids.trace_line_numbers.texture_size[1],
         )
         scroll_height = self.ids.trace_wrapper.height
-        total_lines = len(code_lines)
+        total_lines = self._trace_line_total
 
         if total_lines > 1 and label_height > scroll_height > 0:
             target_scroll = 1.0 - (state.line_number / total_lines)
             self.ids.trace_wrapper.scroll_y = max(0.0, min(1.0, target_scroll))
 
+    def _place_trace_highlight(self, *args):
+        code = self.ids.code_display
+        line_no = self._trace_marked_line
+        if line_no is None or not code.texture_size[1]:
+            self._trace_highlight_rect.size = (0, 0)
+            return
+
+        pad_top, pad_bottom = code.padding[1], code.padding[3]
+        line_h = (code.texture_size[1] - pad_top - pad_bottom) / self._trace_line_total
+        line_top = code.top - pad_top - (line_no - 1) * line_h
+        self._trace_highlight_rect.pos = (code.x, line_top - line_h)
+        self._trace_highlight_rect.size = (code.width, line_h)
+
+    def _place_trace_marker(self, *args):
+        gutter = self.ids.trace_line_numbers
+        marker = self._trace_marker
+        line_no = self._trace_marked_line
+        if line_no is None or not gutter.texture_size[1]:
+            marker.opacity = 0
+            return
+
+        pad_top, pad_bottom = gutter.padding[1], gutter.padding[3]
+        line_h = (gutter.texture_size[1] - pad_top - pad_bottom) / self._trace_line_total
+        line_top = gutter.top - pad_top - (line_no - 1) * line_h
+        marker.size = (gutter.width, line_h)
+        marker.text_size = marker.size
+        marker.pos = (gutter.x, line_top - line_h)
+        marker.opacity = 1
+
 
 
     def _render_call_stack(self, state):
         stack_text = ""
         for i, func in enumerate(reversed(state.stack)):
-            func_name = (
-                func["name"] if isinstance(func, dict) and "name" in func else str(func)
-            )
+            func_name = func.name
 
             if i == 0:
                 stack_text += f"[color=#ffffff]> {func_name}[/color]\n"
@@ -654,6 +922,7 @@ class RootLayout(MDBoxLayout):
             self.ids.line_numbers.font_size = f"{editor_size}sp"
             self.ids.code_display.font_size = f"{editor_size}sp"
             self.ids.trace_line_numbers.font_size = f"{editor_size}sp"
+            self._trace_marker.font_size = f"{editor_size}sp"
         if terminal_size is not None:
             self._terminal_font_size = terminal_size
             self.ids.terminal_display.set_font_size(terminal_size)
@@ -666,6 +935,9 @@ class PythonVisualizer(MDApp):
         self.theme_cls.accent_palette = "Amber"
         return RootLayout()
 
+    def on_stop(self):
+        self.root._worker_pool.shutdown()
+
 
 if __name__ == "__main__":
     PythonVisualizer().run()
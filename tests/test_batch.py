@@ -0,0 +1,75 @@
+import unittest
+import sys
+import os
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from core.batch import run_batch
+
+
+class TestRunBatch(unittest.TestCase):
+    def test_results_cover_every_job(self):
+        jobs = [(f"x = {i}\nprint(x * 2)\n", None) for i in range(6)]
+        results = list(run_batch(jobs, workers=2, timeout=5.0))
+
+        self.assertEqual(sorted(r["index"] for r in results), list(range(6)))
+        for r in results:
+            self.assertIsNone(r["error"])
+            self.assertEqual(r["stdout"], f"{r['index'] * 2}\n")
+            self.assertEqual(r["counts"], {1: 1, 2: 1})
+            self.assertGreater(r["steps"], 0)
+            self.assertIsNone(r["profile"])
+
+    def test_profile_is_opt_in(self):
+        results = list(run_batch([("x = 1\ny = 2\n", None)], workers=1, timeout=5.0, profile=True))
+        self.assertEqual(sorted(results[0]["profile"]["lines"]), [1, 2])
+
+    def test_scripted_inputs_never_block(self):
+        code = "a = input('a? ')\nb = input('b? ')\nprint(a + b)\n"
+        results = sorted(
+            run_batch([(code, ["x", "y"]), (code, ["x"])], workers=2, timeout=5.0),
+            key=lambda r: r["index"],
+        )
+        self.assertEqual(results[0]["stdout"], "a? x\nb? y\nxy\n")
+        self.assertIn("EOFError", results[1]["error"])
+
+    def test_limits_and_errors_are_per_job(self):
+        jobs = [
+            ("while True:\n    pass\n", None),
+            ("x = 1 / 0\n", None),
+            ("def f(:\n", None),
+            ("x = 1\n", None),
+        ]
+        results = sorted(
+            run_batch(jobs, workers=2, timeout=5.0, max_steps=50), key=lambda r: r["index"]
+        )
+        self.assertTrue(results[0]["limit_reached"])
+        self.assertIn("ZeroDivisionError", results[1]["error"])
+        self.assertIn("SyntaxError", results[2]["error"])
+        self.assertIsNone(results[3]["error"])
+
+    def test_stuck_job_does_not_poison_the_pool(self):
+        jobs = [("import time\ntime.sleep(30)\n", None), ("print('after')\n", None)]
+        results = sorted(
+            run_batch(jobs, workers=1, timeout=0.5), key=lambda r: r["index"]
+        )
+        self.assertIn("ExecutionTimeout", results[0]["error"])
+        self.assertEqual(results[1]["stdout"], "after\n")
+
+    def test_jobs_are_read_lazily(self):
+        taken = []
+
+        def jobs():
+            for i in range(20):
+                taken.append(i)
+                yield (f"x = {i}\n", None)
+
+        batch = run_batch(jobs(), workers=1, max_pending=2)
+        next(batch)
+        # the first result plus at most max_pending jobs in flight
+        self.assertLessEqual(len(taken), 3)
+        batch.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,126 @@
+import unittest
+import sys
+import os
+import io
+import json
+import subprocess
+import tempfile
+import time
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, PROJECT_ROOT)
+
+from core import cli
+from core.cli import main
+from core.tracefile import TraceFile
+
+# seconds allowed for `import core.cli` in a fresh interpreter
+IMPORT_BUDGET = 0.25
+
+
+class TestCli(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.out = os.path.join(self.tmp.name, "out")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def _script(self, name, code):
+        path = os.path.join(self.tmp.name, name)
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(code)
+        return path
+
+    def test_import_stays_headless_and_fast(self):
+        probe = (
+            "import sys, time\n"
+            "start = time.perf_counter()\n"
+            "import core.cli\n"
+            "elapsed = time.perf_counter() - start\n"
+            "print(elapsed, any(m.split('.')[0] in ('kivy', 'kivymd') for m in sys.modules))\n"
+        )
+        output = subprocess.run(
+            [sys.executable, "-c", probe], cwd=PROJECT_ROOT, capture_output=True, text=True, check=True
+        ).stdout.split()
+        self.assertEqual(output[1], "False")
+        self.assertLess(float(output[0]), IMPORT_BUDGET)
+
+    def test_trace_writes_traces_and_summary(self):
+        loop = self._script("loop.py", "total = 0\nfor i in range(10):\n    total += i\n")
+        ask = self._script("ask.py", "name = input('name? ')\nprint('hi', name)\n")
+        code = main(["trace", loop, ask, "-o", self.out, "-i", "Ada"], out=io.StringIO())
+        self.assertEqual(code, 0)
+
+        with open(os.path.join(self.out, "summary.json"), encoding="utf-8") as f:
+            summary = json.load(f)
+        self.assertEqual([os.path.basename(s["script"]) for s in summary], ["loop.py", "ask.py"])
+        self.assertEqual(summary[0]["line_counts"], {"1": 1, "2": 11, "3": 10})
+        self.assertGreater(summary[0]["steps_per_sec"], 0)
+        self.assertNotIn("profile", summary[0])
+
+        trace = TraceFile(summary[1]["trace"])
+        self.assertEqual(trace.stdout, "name? Ada\nhi Ada\n")
+        self.assertEqual(len(trace), summary[1]["steps"])
+        trace.close()
+
+    def test_missing_input_and_syntax_errors_are_reported(self):
+        ask = self._script("ask.py", "name = input()\n")
+        broken = self._script("broken.py", "def f(:\n")
+        code = main(["trace", ask, broken, "-o", self.out, "--no-traces"], out=io.StringIO())
+        self.assertEqual(code, 1)
+
+        with open(os.path.join(self.out, "summary.json"), encoding="utf-8") as f:
+            summary = json.load(f)
+        self.assertIn("EOFError", summary[0]["error"])
+        self.assertIn("SyntaxError", summary[1]["error"])
+        self.assertEqual(os.listdir(self.out), ["summary.json"])
+
+    def test_unreadable_scripts_do_not_stop_the_batch(self):
+        missing = os.path.join(self.tmp.name, "missing.py")
+        latin = os.path.join(self.tmp.name, "latin.py")
+        with open(latin, "wb") as f:
+            f.write(b"name = '\xe9'\n")
+        loop = self._script("loop.py", "total = 0\nfor i in range(3):\n    total += i\n")
+        code = main(["trace", missing, latin, loop, "-o", self.out, "--no-traces"], out=io.StringIO())
+        self.assertEqual(code, 1)
+
+        with open(os.path.join(self.out, "summary.json"), encoding="utf-8") as f:
+            summary = json.load(f)
+        self.assertIn("FileNotFoundError", summary[0]["error"])
+        self.assertIn("UnicodeDecodeError", summary[1]["error"])
+        self.assertIsNone(summary[2]["error"])
+        self.assertGreater(summary[2]["steps"], 0)
+
+    @unittest.skipIf(cli.resource is None, "no peak RSS on this platform")
+    def test_peak_rss_is_per_script(self):
+        big = self._script("big.py", "data = bytearray(200 * 1024 * 1024)\ndel data\n")
+        small = self._script("small.py", "x = 1\n")
+        main(["trace", big, small, "-o", self.out, "--no-traces"], out=io.StringIO())
+
+        with open(os.path.join(self.out, "summary.json"), encoding="utf-8") as f:
+            summary = json.load(f)
+        self.assertGreater(summary[0]["peak_rss_kb"], 200 * 1024)
+        self.assertLess(summary[1]["peak_rss_kb"], 100 * 1024)
+
+    def test_runaway_script_is_killed(self):
+        stuck = self._script("stuck.py", "import time\ntime.sleep(30)\n")
+        ask = self._script("ask.py", "name = input('name? ')\nprint('hi', name)\n")
+        started = time.monotonic()
+        code = main(["trace", stuck, ask, "-o", self.out, "-i", "Ada", "--timeout", "0.5"],
+                    out=io.StringIO())
+        self.assertLess(time.monotonic() - started, 10)
+        self.assertEqual(code, 1)
+
+        with open(os.path.join(self.out, "summary.json"), encoding="utf-8") as f:
+            summary = json.load(f)
+        self.assertIn("ExecutionTimeout", summary[0]["error"])
+        self.assertTrue(summary[0]["limit_reached"])
+        self.assertIsNone(summary[1]["error"])
+        trace = TraceFile(summary[1]["trace"])
+        self.assertEqual(trace.stdout, "name? Ada\nhi Ada\n")
+        trace.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,11 +1,13 @@
 import unittest
 import sys
 import os
+import threading
 import time
 
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
 
 from core.executor import Executor, ExecutionTimeout
+from core.parser import CodeParser
 
 
 class TestExecutor(unittest.TestCase):
@@ -50,6 +52,39 @@ class TestExecutor(unittest.TestCase):
 
         self.assertTrue(result["limit_reached"])
 
+    def test_short_program_returns_promptly(self):
+        executor = Executor(code="x = 5\ny = x * 2")
+
+        start_time = time.monotonic()
+        executor.execute()
+        self.assertTrue(time.monotonic() - start_time < 0.05)
+
+    def test_input_wait_not_counted_towards_timeout(self):
+        code = 'import time\nname = input("Name: ")\ntime.sleep(0.4)\nprint("Hi " + name)'
+        executor = Executor(code=code, timeout=0.6)
+
+        def answer_late():
+            while not executor.waiting_for_input:
+                time.sleep(0.01)
+            time.sleep(0.4)
+            executor.provide_input("Bob")
+
+        threading.Thread(target=answer_late).start()
+        result = executor.execute()
+
+        self.assertIsNone(result["error"])
+        self.assertFalse(result["limit_reached"])
+        self.assertEqual(result["steps"][-1].stdout, "Name: \nHi Bob\n")
+
+    def test_stop_wakes_executor(self):
+        executor = Executor(code="import time\nwhile True:\n    time.sleep(0.01)", timeout=10.0)
+        threading.Timer(0.2, executor.stop).start()
+
+        start_time = time.monotonic()
+        result = executor.execute()
+        self.assertTrue(time.monotonic() - start_time < 1.0)
+        self.assertTrue(result["limit_reached"])
+
     def test_step_limit(self):
         code = "while True:\n    pass"
         executor = Executor(code=code, max_steps=50, timeout=5.0)
@@ -58,6 +93,15 @@ class TestExecutor(unittest.TestCase):
         self.assertTrue(result["limit_reached"])
         self.assertEqual(len(result["steps"]), 50)
 
+    def test_one_line_loop_stops_at_step_limit(self):
+        # the loop's only event is a jump from an offset to itself
+        executor = Executor(code="while True: pass", max_steps=50, timeout=5.0)
+
+        result = executor.execute()
+        self.assertTrue(result["limit_reached"])
+        self.assertEqual(len(result["steps"]), 50)
+        self.assertNotIn("ExecutionTimeout", result["error"] or "")
+
     def test_stdout_capture(self):
         code = "print('Hello from Executor!')"
         executor = Executor(code=code)
@@ -78,6 +122,66 @@ print("Hello " + name)
         final_state = result["steps"][-1]
         self.assertEqual(final_state.stdout, "Enter name: Alice\nHello Alice\n")
 
+    def test_non_interactive_input_hits_eof(self):
+        code = "a = input()\nb = input()\n"
+        executor = Executor(code=code, inputs=["1"], interactive=False, timeout=5.0)
+
+        start_time = time.time()
+        result = executor.execute()
+        self.assertLess(time.time() - start_time, 2.0)
+        self.assertIn("EOFError", result["error"])
+
+    def test_settrace_backend(self):
+        code = "def double(v):\n    return v * 2\n\nx = double(21)"
+        results = {}
+        for backend in ("settrace", "monitoring"):
+            executor = Executor(code=code, backend=backend)
+            result = executor.execute()
+            self.assertIsNone(result["error"])
+            results[backend] = [
+                (s.event, s.line_number) for s in result["steps"] if s.event == "line"
+            ]
+
+        self.assertEqual(results["settrace"], results["monitoring"])
+
+    def test_trace_scope(self):
+        code = (
+            "def work(n):\n"
+            "    t = 0\n"
+            "    for i in range(n):\n"
+            "        t += i\n"
+            "    return t\n"
+            "total = 0\n"
+            "# visualize: off\n"
+            "for k in range(50):\n"
+            "    total += k\n"
+            "# visualize: on\n"
+            "r = work(3)\n"
+        )
+        for backend in ("settrace", "monitoring"):
+            with self.subTest(backend=backend):
+                result = Executor(code=code, backend=backend).execute()
+                recorded = {s.line_number for s in result["steps"] if s.event == "line"}
+                self.assertEqual(recorded, {1, 2, 3, 4, 5, 6, 11})
+                # excluded lines are still counted
+                self.assertEqual(result["counts"][9], 50)
+                self.assertEqual(result["steps"][-1].globals["total"], 1225)
+
+                scope = CodeParser.trace_scope(
+                    code, exclude_functions={"work"}, count_excluded=False
+                )
+                result = Executor(code=code, backend=backend, scope=scope).execute()
+                recorded = {s.line_number for s in result["steps"] if s.event == "line"}
+                self.assertEqual(recorded, {1, 6, 11})
+                self.assertNotIn(4, result["counts"])
+                self.assertTrue(all(len(s.stack) == 0 for s in result["steps"]))
+
+    def test_excluded_region_still_times_out(self):
+        code = "# visualize: off\nwhile True:\n    pass\n"
+        result = Executor(code=code, timeout=0.5).execute()
+        self.assertTrue(result["limit_reached"])
+        self.assertIn("ExecutionTimeout", result["error"])
+
     def test_empty_code(self):
         executor = Executor(code="")
         result = executor.execute()
@@ -72,6 +72,56 @@ obj = MyClass(f)
         warnings = CodeParser.validate(code)
         self.assertTrue(any("Syntax Error" in w for w in warnings))
 
+    def test_pragma_lines(self):
+        code = (
+            "x = 1\n"
+            "# visualize: off\n"
+            "for i in range(3):\n"
+            "    x += i\n"
+            "#visualize:ON\n"
+            "y = x  # visualize: off\n"
+            "s = '# visualize: on'\n"
+            "z = 2\n"
+        )
+        # pragmas inside strings do not count; an open region runs to the end
+        self.assertEqual(CodeParser.pragma_lines(code), {3, 4, 7, 8})
+
+    def test_trace_scope_is_none_without_exclusions(self):
+        self.assertIsNone(CodeParser.trace_scope("x = 1  # just a comment"))
+        scope = CodeParser.trace_scope("x = 1", include_functions={"f"})
+        self.assertTrue(scope.traces("f", 1))
+        self.assertFalse(scope.traces("<module>", 1))
+
+
+    def test_global_writes(self):
+        code = (
+            "count = 0\n"
+            "def bump():\n"
+            "    global count, total\n"
+            "    count += 1\n"
+            "class C:\n"
+            "    def reset(self):\n"
+            "        global seen\n"
+            "        seen = set()\n"
+        )
+        # `total` is declared but never stored
+        self.assertEqual(CodeParser.global_writes(code), {"count", "seen"})
+        self.assertEqual(CodeParser.global_writes("def f(x):\n    return x"), frozenset())
+        # the walrus in a generator expression binds a module global
+        self.assertEqual(
+            CodeParser.global_writes("y = 0\ntotal = sum((y := i) for i in range(5))\n"), {"y"}
+        )
+
+    def test_global_writes_gives_up_on_dynamic_access(self):
+        for code in (
+            "g = globals()\n",
+            "exec('x = 1')\n",
+            "import sys\nsys._getframe().f_globals",
+            "import sys\ndef f():\n    return getattr(sys._getframe(), 'f_' + 'globals')\n",
+        ):
+            with self.subTest(code=code):
+                self.assertIsNone(CodeParser.global_writes(code))
+
 
 if __name__ == "__main__":
     unittest.main()
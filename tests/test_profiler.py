@@ -0,0 +1,67 @@
+import unittest
+import sys
+import os
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from core.executor import Executor
+
+CODE = """import time
+
+def fib(n):
+    if n <= 1:
+        return n
+    return fib(n - 1) + fib(n - 2)
+
+time.sleep(0.05)
+x = fib(8)
+"""
+
+
+class TestLineProfiler(unittest.TestCase):
+    def _profile(self, backend):
+        result = Executor(code=CODE, backend=backend, max_steps=100000, profile=True).execute()
+        self.assertIsNone(result["error"])
+        return result["profile"]
+
+    def test_blocking_line_dominates(self):
+        for backend in ("settrace", "monitoring"):
+            with self.subTest(backend=backend):
+                profile = self._profile(backend)
+                sleep = profile["lines"][8]
+                self.assertGreaterEqual(sleep["self_ns"], 45_000_000)
+                self.assertEqual(max(profile["lines"], key=lambda l: profile["lines"][l]["self_ns"]), 8)
+                # asleep, not computing
+                self.assertLess(sleep["cpu_ns"], sleep["self_ns"] / 2)
+
+    def test_recursion_is_not_double_counted(self):
+        profile = self._profile("monitoring")
+        fib = profile["functions"]["fib"]
+        module = profile["functions"]["<module>"]
+        self.assertEqual(fib["calls"], 67)
+        self.assertEqual(fib["total_ns"], fib["self_ns"])
+        self.assertLessEqual(module["total_ns"], profile["elapsed_ns"])
+        # the calling line's total covers the whole call tree
+        self.assertGreaterEqual(profile["lines"][9]["total_ns"], fib["total_ns"])
+        self.assertNotIn(0, profile["lines"])
+
+    def test_self_times_add_up(self):
+        profile = self._profile("settrace")
+        lines = sum(t["self_ns"] for t in profile["lines"].values())
+        functions = sum(t["self_ns"] for t in profile["functions"].values())
+        # only the moment before the module's first line has no line
+        self.assertLessEqual(lines, functions)
+        self.assertGreater(lines, functions * 0.99)
+        self.assertLessEqual(functions, profile["elapsed_ns"])
+
+    def test_off_by_default(self):
+        for backend in ("settrace", "monitoring"):
+            with self.subTest(backend=backend):
+                executor = Executor(code=CODE, backend=backend, max_steps=100000)
+                result = executor.execute()
+                self.assertIsNone(result["profile"])
+                self.assertIsNone(executor.tracer.profiler)
+
+
+if __name__ == "__main__":
+    unittest.main()
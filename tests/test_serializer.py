@@ -4,7 +4,7 @@ import os
 
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
 
-from utils.serializer import Serializer
+from utils.serializer import Serializer, SerializerSession
 
 
 # dummy class to test if it works / stub points????
@@ -78,6 +78,39 @@ class TestSerializer(unittest.TestCase):
         self.assertEqual(val[:2], [1, 2])
         self.assertTrue(val[2].startswith("<Circular Reference "))
 
+    def test_fingerprint_tracks_mutation(self):
+        items = [3, 1, 2]
+        before = self.serializer.fingerprint(items)
+        self.assertEqual(before, self.serializer.fingerprint(items))
+
+        items[0], items[1] = items[1], items[0]
+        self.assertNotEqual(before, self.serializer.fingerprint(items))
+
+        nested = [[1, 2], DummyClass(1)]
+        before = self.serializer.fingerprint(nested)
+        nested[0][1] = 5
+        after = self.serializer.fingerprint(nested)
+        self.assertNotEqual(before, after)
+        nested[1].val = 2
+        self.assertNotEqual(after, self.serializer.fingerprint(nested))
+
+        self.assertNotEqual(self.serializer.fingerprint([1]), self.serializer.fingerprint([True]))
+
+    def test_fingerprint_ignores_what_serialize_skips(self):
+        long_list = [1, 2, 3, 4, 5, 6, 7]
+        before = self.serializer.fingerprint(long_list)
+        long_list[6] = 99  # beyond max_length
+        self.assertEqual(before, self.serializer.fingerprint(long_list))
+
+        l = [1]
+        l.append(l)
+        self.assertEqual(self.serializer.fingerprint(l), self.serializer.fingerprint(l))
+
+    def test_is_frozen(self):
+        self.assertTrue(self.serializer.is_frozen((1, ("a", None))))
+        self.assertFalse(self.serializer.is_frozen((1, [2])))
+        self.assertFalse(self.serializer.is_frozen([1]))
+
     def test_circular_reference_dict(self):
         d = {"a": 1}
         d["self"] = d
@@ -214,5 +247,41 @@ class TestSerializer(unittest.TestCase):
         self.assertTrue(res.startswith("<Serialization Error: "))
 
 
+class TestSerializerSession(unittest.TestCase):
+    def setUp(self):
+        self.session = SerializerSession(max_depth=3, max_length=5)
+        self.serializer = Serializer(max_depth=3, max_length=5)
+
+    def test_output_matches_serializer(self):
+        l = [1, 2]
+        l.append(l)
+        values = [
+            [1, 2, 3], (1, "a"), {"a": [1, {"b": 2}]}, [[[[[1]]]]],
+            DummyClass(DummyClass(3)), {1, 2}, list(range(10)), l, None,
+        ]
+        for value in values:
+            self.assertEqual(self.session.serialize(value), self.serializer.serialize(value))
+
+    def test_wide_strings_are_too_large(self):
+        # under 256K characters, but over 1MB at 4 bytes per character
+        wide = "\U0001F600" * (256 * 1024 - 8)
+        self.assertGreater(sys.getsizeof(wide), 1024 * 1024)
+        self.assertEqual(self.session.serialize([wide])["value"], ["<Data too large to visualize>"])
+        self.assertEqual(self.serializer.serialize([wide])["value"], ["<Data too large to visualize>"])
+
+    def test_unchanged_objects_share_payload(self):
+        row = [1, 2]
+        grid = [row, [3, 4]]
+        first = self.session.serialize(grid)
+        self.assertIs(self.session.serialize(grid), first)
+
+        grid[1][0] = 5
+        second = self.session.serialize(grid)
+        self.assertIsNot(second, first)
+        self.assertIs(second["value"][0], first["value"][0])
+        self.assertEqual(second["value"][1]["value"], [5, 4])
+        self.assertIs(self.session.heap[hex(id(grid))], second)
+
+
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,59 @@
+import unittest
+import sys
+import os
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from core.executor import Executor
+from core.stats import Histogram, TracerStats
+from core.tracer import Tracer
+
+CODE = "import json\nitems = []\nfor i in range(5):\n    items.append(json.dumps(i))\n"
+
+
+class TestHistogram(unittest.TestCase):
+    def test_power_of_two_buckets(self):
+        hist = Histogram()
+        for ns in (0, 1, 3, 4, 900, 1000, 1100):
+            hist.add(ns)
+        report = hist.report()
+        self.assertEqual(report["count"], 7)
+        self.assertEqual(report["max_ns"], 1100)
+        self.assertEqual(report["buckets"], {1: 1, 2: 1, 4: 1, 8: 1, 1024: 2, 2048: 1})
+        self.assertEqual(report["p50_ns"], 8)
+        self.assertEqual(report["p99_ns"], 1100)
+
+
+class TestTracerStats(unittest.TestCase):
+    def test_disabled_by_default(self):
+        self.assertIsNone(Tracer().stats())
+        self.assertIsNone(Executor(code="x = 1").execute()["stats"])
+
+    def test_phases_and_counters(self):
+        for backend in ("settrace", "monitoring"):
+            with self.subTest(backend=backend):
+                result = Executor(code=CODE, backend=backend, stats=True).execute()
+                stats = result["stats"]
+                steps = len(result["steps"])
+                counters = stats["counters"]
+
+                self.assertEqual(set(stats["phases"]), set(TracerStats.PHASES) | {"record"})
+                for name, phase in stats["phases"].items():
+                    self.assertEqual(phase["count"], steps, name)
+                record = stats["phases"]["record"]["total_ns"]
+                phases = sum(stats["phases"][p]["total_ns"] for p in TracerStats.PHASES)
+                self.assertEqual(record, phases)
+
+                self.assertEqual(counters["events_recorded"], steps)
+                self.assertGreaterEqual(counters["events_seen"], steps)
+                self.assertGreater(counters["serializer_calls"], 0)
+                if backend == "settrace":
+                    # json's own frames are seen, then filtered out
+                    self.assertGreater(counters["events_filtered"], 0)
+                    self.assertEqual(
+                        counters["events_seen"] - counters["events_filtered"], steps
+                    )
+
+
+if __name__ == "__main__":
+    unittest.main()
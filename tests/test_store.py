@@ -0,0 +1,99 @@
+import unittest
+import sys
+import os
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from core.store import TraceStore
+from core.tracer import Tracer
+
+
+class Step:
+    def __init__(self, index):
+        self.index = index
+        self.owner = None
+
+
+class TestTraceStore(unittest.TestCase):
+    def setUp(self):
+        self.store = TraceStore(window=5, owner="tracer")
+        self.store.CHUNK = 4
+        self.steps = [Step(i) for i in range(23)]
+        for step in self.steps:
+            self.store.append(step)
+
+    def tearDown(self):
+        self.store.close()
+
+    def test_old_steps_are_spilled(self):
+        self.assertEqual(len(self.store), 23)
+        self.assertEqual(self.store.spilled, 16)
+        self.assertEqual(len(self.store._recent), 7)
+
+    def test_reads_across_the_spill(self):
+        self.assertEqual([s.index for s in self.store], list(range(23)))
+        self.assertEqual(self.store[-1].index, 22)
+        self.assertEqual([s.index for s in self.store[2:20:6]], [2, 8, 14])
+        with self.assertRaises(IndexError):
+            self.store[23]
+
+    def test_spilled_steps_are_copies_owned_by_the_store_owner(self):
+        self.assertIsNot(self.store[0], self.steps[0])
+        self.assertEqual(self.store[0].owner, "tracer")
+        # recent steps are the live objects
+        self.assertIs(self.store[22], self.steps[22])
+
+    def test_reads_while_appending(self):
+        self.assertEqual(self.store[3].index, 3)
+        for i in range(23, 40):
+            self.store.append(Step(i))
+        self.assertEqual(self.store[30].index, 30)
+        self.assertEqual(self.store[3].index, 3)
+
+
+    def test_replace_writes_spilled_steps_back(self):
+        step = self.store[5]
+        step.stdout_offset = 42
+        self.store.replace(5, step)
+        self.store.replace(20, Step(99))
+        # push chunk 1 out of the decoded-chunk cache
+        self.store._cache.clear()
+
+        self.assertEqual(self.store[5].stdout_offset, 42)
+        self.assertEqual([s.index for s in self.store[4:8]], [4, 5, 6, 7])
+        self.assertEqual(self.store[20].index, 99)
+
+
+class TestTracerSpill(unittest.TestCase):
+    def _trace(self, tracer):
+        code_obj = compile(
+            "total = 0\nitems = []\nfor i in range(200):\n    total += i\n    items.append(i % 7)\n",
+            "<string>",
+            "exec",
+        )
+        sys.settrace(tracer.trace)
+        try:
+            exec(code_obj, {})
+        finally:
+            sys.settrace(None)
+        return tracer
+
+    def test_get_state_reads_spilled_steps(self):
+        full = self._trace(Tracer(max_steps=10000, keyframe_interval=10))
+        windowed = self._trace(Tracer(max_steps=10000, keyframe_interval=10, trace_window=20))
+        self.assertGreater(windowed.trace_data.spilled, 0)
+        self.assertEqual(len(windowed.get_trace()), len(full.get_trace()))
+
+        for index in (0, 5, 123, 300, len(full.get_trace()) - 1):
+            expected = full.get_state(index)
+            state = windowed.get_state(index)
+            self.assertEqual(state.line_number, expected.line_number)
+            self.assertEqual(state.globals.get("total"), expected.globals.get("total"))
+            self.assertEqual(
+                state.globals.get("items", {}).get("value"),
+                expected.globals.get("items", {}).get("value"),
+            )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,131 @@
+import unittest
+import sys
+import os
+import pickle
+import tempfile
+from unittest import mock
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from core.executor import Executor
+from core import tracefile
+from core.tracefile import TraceFile, TraceWriter, load_trace, write_trace
+
+
+def _touch(path):
+    open(path, "w").close()
+
+
+class _Payload:
+    def __init__(self, marker):
+        self.marker = marker
+
+    def __reduce__(self):
+        return (_touch, (self.marker,))
+
+
+class TestTraceFile(unittest.TestCase):
+    def setUp(self):
+        fd, self.path = tempfile.mkstemp(suffix=".pvtrace")
+        os.close(fd)
+
+    def tearDown(self):
+        os.remove(self.path)
+
+    def _record(self, code, **kwargs):
+        executor = Executor(code=code, **kwargs)
+        result = executor.execute()
+        write_trace(self.path, executor.tracer, code, result["error"])
+        return executor.tracer, result
+
+    def test_round_trip(self):
+        code = (
+            "def add(a, b):\n    return a + b\n"
+            "grid = [[0, 1], [2, 3]]\n"
+            "total = add(grid[0][1], 2)\n"
+            "name = input('name? ')\n"
+            "print('hi', name, total)\n"
+        )
+        original, result = self._record(code, inputs=["Ada"], profile=True)
+        replay, replay_code = load_trace(self.path)
+
+        self.assertEqual(replay_code, code)
+        self.assertEqual(len(replay.get_trace()), len(result["steps"]))
+        self.assertEqual(replay.line_counts, result["counts"])
+        self.assertEqual(replay.get_profile(), result["profile"])
+        self.assertEqual(replay.get_stdout(), original.get_stdout())
+        for i in range(len(result["steps"])):
+            expected = original.get_state(i)
+            state = replay.get_state(i)
+            self.assertEqual(state.line_number, expected.line_number)
+            self.assertEqual(state.event, expected.event)
+            self.assertEqual(state.locals, expected.locals)
+            self.assertEqual(state.globals, expected.globals)
+            self.assertEqual(state.stdout, expected.stdout)
+            self.assertEqual([f.name for f in state.stack], [f.name for f in expected.stack])
+        replay.trace_data.close()
+
+    def test_sampling_is_kept(self):
+        code = "total = 0\nfor i in range(500):\n    total += i\n"
+        original, result = self._record(code, sample_after=20, sample_target=60)
+        replay, _ = load_trace(self.path)
+
+        self.assertIsNotNone(original.sampled_from)
+        self.assertEqual(replay.sampled_from, original.sampled_from)
+        self.assertEqual(
+            [replay.get_state(i).elided for i in range(len(result["steps"]))],
+            [s.elided for s in result["steps"]],
+        )
+        replay.trace_data.close()
+
+    def test_error_and_limit_are_kept(self):
+        self._record("x = 1\ny = x / 0")
+        trace = TraceFile(self.path)
+        self.assertIn("ZeroDivisionError", trace.error)
+        self.assertFalse(trace.limit_reached)
+        trace.close()
+
+    def test_unchanged_payloads_are_stored_once(self):
+        self._record("data = [1, 2, 3]\nfor i in range(20):\n    x = i\n")
+        trace = TraceFile(self.path)
+        # the list (and the injected input()) never change, so every step
+        # shares their heap records
+        self.assertEqual(len(trace._heap_offsets), 2)
+        payloads = [trace[i].globals_delta.changed.get("data") for i in range(len(trace))]
+        payloads = [p for p in payloads if p is not None]
+        self.assertEqual(payloads[0]["value"], [1, 2, 3])
+        trace.close()
+
+    def test_heap_cache_is_bounded(self):
+        self._record("items = []\nfor i in range(30):\n    items = [i]\n")
+        trace = TraceFile(self.path)
+        self.assertGreater(len(trace._heap_offsets), 8)
+        with mock.patch.object(tracefile, "HEAP_CACHE_LIMIT", 4):
+            values = [trace[i].globals_delta.changed.get("items") for i in range(len(trace))]
+            self.assertLessEqual(len(trace._heap_cache), 4)
+        self.assertEqual([v["value"] for v in values if v is not None][-1], [29])
+        trace.close()
+
+    def test_refuses_foreign_globals(self):
+        marker = self.path + ".ran"
+        writer = TraceWriter(self.path)
+        data = pickle.dumps(_Payload(marker), pickle.HIGHEST_PROTOCOL)
+        writer._step_offsets.append(writer._file.tell())
+        writer._step_lengths.append(len(data))
+        writer._file.write(data)
+        writer.finish(code="x = 1")
+        trace = TraceFile(self.path)
+        with self.assertRaises(pickle.UnpicklingError):
+            trace[0]
+        trace.close()
+        self.assertFalse(os.path.exists(marker))
+
+    def test_rejects_other_files(self):
+        with open(self.path, "wb") as f:
+            f.write(b"print('not a trace')\n" * 10)
+        with self.assertRaises(ValueError):
+            TraceFile(self.path)
+
+
+if __name__ == "__main__":
+    unittest.main()
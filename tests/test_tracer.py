@@ -5,7 +5,15 @@ import io
 
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
 
-from core.tracer import Tracer, ExecutionState, ExecutionLimitReached
+from core.tracer import (
+    Tracer,
+    MonitoringTracer,
+    StepBatcher,
+    ExecutionState,
+    ExecutionLimitReached,
+    Sampler,
+)
+from core.parser import CodeParser
 from utils.serializer import Serializer
 
 
@@ -83,6 +91,42 @@ class TestTracer(unittest.TestCase):
             last_state = trace[-1]
             self.assertEqual(last_state.stdout, "Hello, Tracer!\n")
 
+    def test_trace_stdout_offsets(self):
+        code_str = "for i in range(3):\n    print(i)"
+        code_obj = compile(code_str, "<string>", "exec")
+
+        import contextlib
+
+        with contextlib.redirect_stdout(self.buffer):
+            sys.settrace(self.tracer.trace)
+            try:
+                exec(code_obj, {})
+            finally:
+                sys.settrace(None)
+
+        trace = self.tracer.get_trace()
+        offsets = [s.stdout_offset for s in trace]
+        self.assertEqual(offsets, sorted(offsets))
+        self.assertEqual(trace[0].stdout, "")
+        self.assertEqual(trace[-1].stdout, "0\n1\n2\n")
+        self.assertNotIn("stdout", ExecutionState.__slots__)
+
+    def test_stdout_edit_and_refresh(self):
+        steps = []
+        self.tracer.on_step = steps.append
+        self._trace_with(self.tracer, "x = 1")
+        self.buffer.write("Name: ")
+
+        self.tracer.append_stdout("Bo")
+        self.tracer.refresh_stdout()
+        self.assertEqual(steps[-1].stdout, "Name: Bo")
+
+        self.tracer.erase_stdout(1)
+        self.tracer.append_stdout("x")
+        self.tracer.refresh_stdout()
+        self.assertEqual(steps[-1].stdout, "Name: Bx")
+        self.assertEqual(self.tracer.get_trace()[0].stdout, "")
+
     def test_trace_exception_capture(self):
         code_str = "x = 1 / 0"
         code_obj = compile(code_str, "<string>", "exec")
@@ -129,10 +173,386 @@ outer()
         self.assertTrue(len(inner_states) > 0)
 
         inner_state = inner_states[0]
-        stack_names = [s["name"] for s in inner_state.stack]
+        stack_names = [s.name for s in inner_state.stack]
         self.assertIn("outer", stack_names)
         self.assertIn("inner", stack_names)
 
+    def test_stack_is_shared_between_steps(self):
+        trace = self._trace_with(
+            self.tracer,
+            "def inner():\n    return 1\n\ndef outer():\n    a = inner()\n    b = a\n\nouter()\nx = 0",
+        )
+        outer = [s for s in trace if s.func_name == "outer"]
+        inner = [s for s in trace if s.func_name == "inner"]
+
+        # one stack object for every step of the same call
+        self.assertTrue(all(s.stack is outer[0].stack for s in outer))
+        self.assertTrue(all(s.stack is inner[0].stack for s in inner))
+        self.assertIs(inner[0].stack.parent, outer[0].stack)
+        self.assertEqual([f.name for f in reversed(inner[0].stack)], ["inner", "outer"])
+        self.assertEqual(len(trace[-1].stack), 0)
+
+    def test_stack_survives_pickling(self):
+        import pickle
+
+        trace = self._trace_with(
+            self.tracer, "def f(n):\n    if n:\n        f(n - 1)\n\nf(3)"
+        )
+        deepest = max(trace, key=lambda s: len(s.stack))
+        copied = pickle.loads(pickle.dumps(deepest))
+
+        self.assertEqual([f.name for f in copied.stack], ["f"] * 4)
+        self.assertEqual(copied.stack, deepest.stack)
+        self.assertIsNone(copied.owner)
+
+    def _trace_with(self, tracer, code_str):
+        code_obj = compile(code_str, "<string>", "exec")
+        sys.settrace(tracer.trace)
+        try:
+            exec(code_obj, {})
+        finally:
+            sys.settrace(None)
+        return tracer.get_trace()
+
+    def test_delta_encoding(self):
+        trace = self._trace_with(self.tracer, "x = 1\ny = 2\nx = 3\ndel y")
+        line_states = [s for s in trace if s.event == "line"]
+
+        self.assertEqual(line_states[1].locals_delta.changed, {"x": 1})
+        self.assertEqual(line_states[2].locals_delta.changed, {"y": 2})
+        self.assertEqual(line_states[3].locals_delta.changed, {"x": 3})
+        self.assertEqual(trace[-1].locals_delta.removed, ("y",))
+
+    def _strip_refs(self, value):
+        # heap addresses differ between two runs of the same program
+        if isinstance(value, dict):
+            return {k: self._strip_refs(v) for k, v in value.items() if k != "__ref__"}
+        if isinstance(value, list):
+            return [self._strip_refs(v) for v in value]
+        return value
+
+    def test_get_state_matches_full_snapshots(self):
+        code_str = """
+def bump(items, n):
+    for i in range(n):
+        items.append(i)
+    return len(items)
+
+data = []
+total = bump(data, 6)
+del data
+"""
+        reference = self._trace_with(Tracer(keyframe_interval=1), code_str)
+        tracer = Tracer(keyframe_interval=4)
+        trace = self._trace_with(tracer, code_str)
+
+        self.assertEqual(len(trace), len(reference))
+        self.assertTrue(trace[0].is_keyframe)
+        self.assertFalse(trace[1].is_keyframe)
+
+        # sequential, backwards and random access must all agree
+        order = list(range(len(trace))) + list(reversed(range(len(trace)))) + [7, 2, 11, 3]
+        for i in order:
+            state = tracer.get_state(i)
+            expected_locals = self._strip_refs(reference[i].locals)
+            self.assertEqual(self._strip_refs(state.locals), expected_locals)
+            self.assertEqual(self._strip_refs(state.globals), self._strip_refs(reference[i].globals))
+            self.assertEqual(self._strip_refs(trace[i].locals), expected_locals)
+
+    def test_get_state_keeps_variable_order(self):
+        code_str = """
+def f():
+    if False:
+        a = 1
+    b = 2
+    a = 3
+    del b
+    b = 4
+    return a
+
+f()
+"""
+        reference = self._trace_with(Tracer(keyframe_interval=1), code_str)
+        tracer = Tracer(keyframe_interval=100)
+        self._trace_with(tracer, code_str)
+        for i in range(len(reference)):
+            self.assertEqual(list(tracer.get_state(i).locals), list(reference[i].locals))
+
+    def test_deltas_hold_exactly_the_changed_variables(self):
+        code_str = """
+from types import SimpleNamespace as Node
+
+def swap(items, i, j):
+    items[i], items[j] = items[j], items[i]
+
+data = [3, 1, 2]
+grid = [[0, 0], [0, 0]]
+pair = (1, (2, 3))
+node = Node(val=1)
+swap(data, 0, 1)
+grid[1][0] = 5
+node.val = 2
+pair = (pair, "x")
+data = data
+"""
+        reference = self._trace_with(Tracer(keyframe_interval=1), code_str)
+        tracer = Tracer(keyframe_interval=3)
+        trace = self._trace_with(tracer, code_str)
+
+        self.assertEqual(len(trace), len(reference))
+        for i in list(range(len(trace))) + [5, 1]:
+            state = tracer.get_state(i)
+            self.assertEqual(self._strip_refs(state.locals), self._strip_refs(reference[i].locals))
+            self.assertEqual(self._strip_refs(state.globals), self._strip_refs(reference[i].globals))
+        for i in range(1, len(trace)):
+            prev = self._strip_refs(reference[i - 1].globals)
+            cur = self._strip_refs(reference[i].globals)
+            expected = {k for k, v in cur.items() if k not in prev or prev[k] != v}
+            self.assertEqual(set(trace[i].globals_delta.changed), expected)
+
+    def test_global_writes_match_full_snapshots(self):
+        code_str = """
+count = 0
+data = []
+
+def bump(n):
+    global count
+    count += n
+    data.append(n)
+
+def peek():
+    return len(data)
+
+def grow(n):
+    if n:
+        grow(n - 1)
+    data.append(peek())
+
+x = 1; bump(2)
+grow(3)
+bump(x); y = peek()
+"""
+        reference = Tracer(keyframe_interval=1)
+        self._trace_with(reference, code_str)
+        tracer = Tracer(keyframe_interval=1, global_writes=CodeParser.global_writes(code_str))
+        trace = self._trace_with(tracer, code_str)
+
+        self.assertEqual(len(trace), len(reference.get_trace()))
+        for i in range(len(trace)):
+            self.assertEqual(
+                self._strip_refs(tracer.get_state(i).globals),
+                self._strip_refs(reference.get_state(i).globals),
+            )
+        # peek() cannot rebind or mutate globals: once it runs, its
+        # steps reuse the previous snapshot
+        reused = [
+            trace[i]._globals is trace[i - 1]._globals
+            for i in range(1, len(trace))
+            if trace[i].func_name == "peek" and trace[i].event != "call"
+        ]
+        self.assertTrue(reused and all(reused))
+
+    def test_global_writes_see_walrus_in_generators(self):
+        code_str = "y = 0\ntotal = sum((y := i) for i in range(5))\nz = y\n"
+        reference = Tracer(keyframe_interval=1)
+        self._trace_with(reference, code_str)
+        tracer = Tracer(keyframe_interval=1, global_writes=CodeParser.global_writes(code_str))
+        trace = self._trace_with(tracer, code_str)
+
+        self.assertEqual(len(trace), len(reference.get_trace()))
+        for i in range(len(trace)):
+            self.assertEqual(
+                self._strip_refs(tracer.get_state(i).globals),
+                self._strip_refs(reference.get_state(i).globals),
+            )
+
+    def test_identity_snapshots_match_full_snapshots(self):
+        code_str = """
+from collections import defaultdict
+grid = [[0, 1], [2, 3]]
+seen = defaultdict(list)
+row = grid[0]
+i = 0
+while i < 3:
+    i += 1
+    x = seen[i]
+    row += [i]
+    total = i * 2
+"""
+        reference = Tracer(keyframe_interval=1)
+        reference._identity = False
+        self._trace_with(reference, code_str)
+        tracer = Tracer(keyframe_interval=1, stats=True)
+        trace = self._trace_with(tracer, code_str)
+
+        self.assertEqual(len(trace), len(reference.get_trace()))
+        for i in range(len(trace)):
+            self.assertEqual(
+                self._strip_refs(tracer.get_state(i).locals),
+                self._strip_refs(reference.get_state(i).locals),
+            )
+        # `i += 1` and `total = i * 2` cannot change grid: those steps
+        # reuse its payload without serializing it again
+        self.assertLess(tracer.stats()["counters"]["serializer_calls"], sum(len(s.locals) for s in trace))
+
+    def test_unchanged_payloads_are_reused(self):
+        tracer = Tracer()
+        trace = self._trace_with(tracer, "data = [1, 2]\nx = 1\nx = 2\ndata.append(3)\ny = 0")
+        line_states = [s for s in trace if s.event == "line"]
+
+        first, second = line_states[2].globals["data"], line_states[3].globals["data"]
+        self.assertIs(first, second)
+        self.assertEqual(line_states[4].globals["data"]["value"], [1, 2, 3])
+        self.assertEqual(set(line_states[4].globals_delta.changed), {"data"})
+
+    def test_sampler_period_grows_with_the_run(self):
+        sampler = Sampler(keep_first=4, target_steps=12)
+        kept = [sampler.keep("line") for _ in range(40)]
+
+        self.assertEqual(kept[:4], [True] * 4)
+        # all kept while the budget outpaces the run, then ever sparser
+        self.assertEqual(
+            kept[4:],
+            [True] * 6 + [False, True] + [False] * 5 + [True] + [False] * 8 + [True] + [False] * 12 + [True],
+        )
+        # dropped events pile up until the tracer takes them for a step
+        self.assertEqual(sampler.take_elided(), kept.count(False))
+        self.assertEqual(sampler.take_elided(), 0)
+        self.assertTrue(sampler.keep("call"))
+
+    def test_sampler_settles_near_target(self):
+        for events in (10**4, 10**5, 10**6):
+            with self.subTest(events=events):
+                sampler = Sampler(keep_first=100, target_steps=2000)
+                keep = sampler.keep
+                kept = sum(keep("line") for _ in range(events))
+                self.assertGreater(kept, 1900)
+                self.assertLess(kept, 2020)
+
+    def test_sampling_keeps_counts_and_calls(self):
+        code_str = """
+def work(n):
+    total = 0
+    for i in range(n):
+        total += i
+    return total
+
+for _ in range(20):
+    result = work(30)
+"""
+        full = Tracer(max_steps=100000)
+        reference = self._trace_with(full, code_str)
+        tracer = Tracer(max_steps=100000, sample_after=50, sample_target=200)
+        trace = self._trace_with(tracer, code_str)
+
+        self.assertLess(len(trace), len(reference) // 4)
+        self.assertEqual(tracer.line_counts, full.line_counts)
+        for event in ("call", "return"):
+            self.assertEqual(
+                sum(s.event == event for s in trace), sum(s.event == event for s in reference)
+            )
+        lines = sum(s.event == "line" for s in trace)
+        self.assertEqual(lines + sum(s.elided for s in trace), sum(tracer.line_counts.values()))
+        self.assertEqual(tracer.sampled_from, next(i for i, s in enumerate(trace) if s.elided))
+        self.assertGreaterEqual(tracer.sampled_from, 50)
+
+        # a sampled step still shows the program's real state at that point
+        last = tracer.get_state(len(trace) - 1)
+        self.assertEqual(last.globals["result"], sum(range(30)))
+
+
+class TestStepBatcher(unittest.TestCase):
+    def setUp(self):
+        self.scheduled = []
+        self.batches = []
+        self.batcher = StepBatcher(self.batches.append, self.scheduled.append)
+
+    def test_one_flush_per_frame(self):
+        tracer = Tracer(max_steps=100, on_step=self.batcher)
+        code_obj = compile("for i in range(5):\n    x = i", "<string>", "exec")
+
+        sys.settrace(tracer.trace)
+        try:
+            exec(code_obj, {})
+        finally:
+            sys.settrace(None)
+
+        self.assertEqual(len(self.scheduled), 1)
+        self.scheduled.pop()(0)
+        self.assertEqual(self.batches, [tracer.get_trace()])
+
+    def test_steps_after_flush_schedule_again(self):
+        self.batcher("a")
+        self.batcher("b")
+        self.scheduled.pop()(0)
+        self.batcher("c")
+
+        self.assertEqual(len(self.scheduled), 1)
+        self.scheduled.pop()(0)
+        self.assertEqual(self.batches, [["a", "b"], ["c"]])
+
+    def test_empty_flush_delivers_nothing(self):
+        self.batcher.flush()
+        self.assertEqual(self.batches, [])
+
+
+@unittest.skipUnless(MonitoringTracer.is_available(), "sys.monitoring is not available")
+class TestMonitoringTracer(unittest.TestCase):
+    def setUp(self):
+        self.buffer = io.StringIO()
+        self.tracer = MonitoringTracer(stdout_buffer=self.buffer, max_steps=100)
+
+    def _run(self, code_str):
+        code_obj = compile(code_str, "<string>", "exec")
+        self.tracer.start(code_obj)
+        try:
+            exec(code_obj, {})
+        finally:
+            self.tracer.stop()
+
+    def test_trace_basic_assignment(self):
+        self._run("x = 10\ny = 20")
+
+        line_states = [s for s in self.tracer.get_trace() if s.event == "line"]
+        self.assertEqual([s.line_number for s in line_states], [1, 2])
+        self.assertEqual(line_states[1].locals["x"], 10)
+
+    def test_trace_function_stack(self):
+        self._run("def inner():\n    z = 3\n\ndef outer():\n    inner()\n\nouter()\n")
+
+        inner_states = [
+            s for s in self.tracer.get_trace() if s.func_name == "inner" and s.event == "line"
+        ]
+        self.assertTrue(len(inner_states) > 0)
+        stack_names = [s.name for s in inner_states[0].stack]
+        self.assertEqual(stack_names, ["outer", "inner"])
+
+    def test_trace_exception_capture(self):
+        with self.assertRaises(ZeroDivisionError):
+            self._run("x = 1 / 0")
+
+        exception_states = [s for s in self.tracer.get_trace() if s.event == "exception"]
+        self.assertEqual(len(exception_states), 1)
+        self.assertEqual(exception_states[0].exception["type"], "ZeroDivisionError")
+
+    def test_library_code_is_not_traced(self):
+        self._run("import json\ndata = json.dumps([1, 2, 3])")
+
+        self.assertTrue(all(s.func_name == "<module>" for s in self.tracer.get_trace()))
+
+    def test_trace_max_steps_limit(self):
+        self.tracer.max_steps = 10
+
+        with self.assertRaises(ExecutionLimitReached):
+            self._run("while True:\n    pass")
+
+        self.assertTrue(self.tracer.limit_reached)
+        self.assertEqual(len(self.tracer.get_trace()), 10)
+
+    def test_stop_releases_tool_id(self):
+        self._run("x = 1")
+        self.assertTrue(MonitoringTracer.is_available())
+
 
 if __name__ == "__main__":
     unittest.main()
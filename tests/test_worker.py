@@ -0,0 +1,114 @@
+import unittest
+import sys
+import os
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from core.executor import Executor
+from core.parser import CodeParser
+from core.worker import WorkerPool
+
+
+class TestWorkerPool(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.pool = WorkerPool(size=1)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.pool.shutdown()
+
+    def test_basic_execution(self):
+        code = "x = 5\ny = [x, x * 2]\nprint('y =', y)"
+        streamed = []
+        executor = Executor(code=code, pool=self.pool, on_step=streamed.append, profile=True)
+        result = executor.execute()
+
+        self.assertIsNone(result["error"])
+        self.assertFalse(result["limit_reached"])
+        self.assertEqual(result["counts"], {1: 1, 2: 1, 3: 1})
+        self.assertEqual(sorted(result["profile"]["lines"]), [1, 2, 3])
+        self.assertTrue(len(streamed) >= len(result["steps"]))
+
+        final_state = result["steps"][-1]
+        self.assertEqual(final_state.stdout, "y = [5, 10]\n")
+        self.assertEqual(final_state.locals["y"]["value"], [5, 10])
+
+    def test_stats_come_from_the_worker(self):
+        result = Executor(code="x = 1\ny = x + 1", pool=self.pool, stats=True).execute()
+        self.assertEqual(result["stats"]["counters"]["events_recorded"], len(result["steps"]))
+        self.assertIsNone(Executor(code="x = 1", pool=self.pool).execute()["stats"])
+
+    def test_mock_input(self):
+        code = 'name = input("Enter name: ")\nprint("Hello " + name)'
+        executor = Executor(code=code, inputs=["Alice"], pool=self.pool)
+        result = executor.execute()
+
+        self.assertEqual(result["steps"][-1].stdout, "Enter name: Alice\nHello Alice\n")
+
+    def test_output_without_steps_reaches_the_parent(self):
+        code = "for i in range(3):\n    print(i)\n"
+        scope = CodeParser.trace_scope(code, include_functions={"untraced"})
+        executor = Executor(code=code, pool=self.pool, scope=scope)
+        result = executor.execute()
+
+        self.assertEqual(len(result["steps"]), 0)
+        self.assertEqual(executor.tracer.get_stdout(), "0\n1\n2\n")
+
+    def test_runtime_exception(self):
+        executor = Executor(code="x = 1 / 0", pool=self.pool)
+        result = executor.execute()
+        self.assertIn("ZeroDivisionError", result["error"])
+
+    def test_shared_payloads_are_received_once(self):
+        code = "a = [1, 2]\nb = a\ngrid = [a, a]\nx = 0"
+        result = Executor(code=code, pool=self.pool).execute()
+
+        final = result["steps"][-1]
+        self.assertIs(final.globals["a"], final.globals["b"])
+        rows = final.globals["grid"]["value"]
+        self.assertIs(rows[0], rows[1])
+        self.assertEqual(rows[0]["value"], [1, 2])
+
+    def test_timeout_kills_worker(self):
+        executor = Executor(
+            code="while True:\n    pass", timeout=0.5, max_steps=10**9, pool=self.pool
+        )
+
+        start_time = time.time()
+        result = executor.execute()
+        self.assertTrue(time.time() - start_time < 2.0)
+        self.assertTrue(result["limit_reached"])
+        self.assertIn("ExecutionTimeout", result["error"])
+
+        # the pool replaced the killed worker
+        result = Executor(code="x = 1", pool=self.pool).execute()
+        self.assertIsNone(result["error"])
+
+    def test_done_says_whether_the_worker_is_reusable(self):
+        def run(code):
+            worker = self.pool.acquire()
+            worker.send(("run", code, [], 0.3, 1000, "monitoring", False, False, None, None, 100000))
+            while True:
+                msg = worker.messages.get(timeout=10)
+                if msg[0] == "done":
+                    self.pool.discard(worker)
+                    return msg
+
+        self.assertTrue(run("x = 1")[-1])
+        # the run thread is still asleep, so the worker is on its way out
+        done = run("import time\ntime.sleep(30)")
+        self.assertIn("ExecutionTimeout", done[5])
+        self.assertFalse(done[-1])
+
+    def test_worker_crash(self):
+        result = Executor(code="import os\nos._exit(3)", pool=self.pool).execute()
+        self.assertIn("WorkerCrashed", result["error"])
+
+        result = Executor(code="x = 1", pool=self.pool).execute()
+        self.assertIsNone(result["error"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,6 +1,15 @@
 import types
 import sys
 
+# Types whose serialized form depends only on their value
+SCALAR_TYPES = (type(None), bool, int, float, complex, str, bytes, range)
+
+# Types serialize() returns as-is (or as "None")
+_PRIMITIVE_TYPES = frozenset((type(None), bool, int, float, str))
+
+# values bigger than this (sys.getsizeof) are not visualized
+_SIZE_LIMIT = 1024 * 1024
+
 
 class Serializer:
     def __init__(self, max_depth=3, max_length=20):
@@ -10,6 +19,95 @@ class Serializer:
     def serialize(self, obj):
         return self._serialize_recursive(obj, depth=0, seen=set())
 
+    def fingerprint(self, obj):
+        """Cheap summary of everything `serialize` would look at.
+
+        It follows the same depth/length limits but only collects ids,
+        types, lengths and scalar values into tuples, so two equal
+        fingerprints mean `serialize` would return equal output.
+        """
+        return self._fingerprint_recursive(obj, depth=0, seen=set())
+
+    def is_frozen(self, obj, depth=0):
+        """True if nothing `serialize` would read from `obj` can change."""
+        if type(obj) in SCALAR_TYPES or depth > self.max_depth:
+            return True
+        if type(obj) in (tuple, frozenset):
+            return all(self.is_frozen(x, depth + 1) for x in list(obj)[: self.max_length])
+        return False
+
+    # mirrors _serialize_recursive branch for branch
+    def _fingerprint_recursive(self, obj, depth, seen):
+        cls = type(obj)
+        if cls in _PRIMITIVE_TYPES:
+            return (cls, obj)
+
+        obj_id = id(obj)
+        if obj_id in seen:
+            return ("circular", obj_id)
+
+        if depth > self.max_depth:
+            return (cls,)
+
+        if sys.getsizeof(obj, 0) > _SIZE_LIMIT:
+            return ("too large",)
+
+        try:
+            if isinstance(obj, (bool, int, float, str)):
+                return (cls, obj)
+
+            if isinstance(obj, (list, tuple, dict, set)) or hasattr(obj, "__dict__"):
+                seen.add(obj_id)
+
+            if isinstance(obj, (list, tuple)):
+                return (cls, obj_id, len(obj) > self.max_length,
+                        self._fingerprint_items(obj[: self.max_length], depth, seen))
+
+            if isinstance(obj, set):
+                items = list(obj)
+                return (set, obj_id, len(items),
+                        self._fingerprint_items(items[: self.max_length], depth, seen))
+
+            if isinstance(obj, dict):
+                keys = list(obj.keys())
+                if len(keys) > self.max_length:
+                    keys = keys[: self.max_length]
+                    values = [obj[k] for k in keys]
+                else:
+                    values = list(obj.values())
+                return (dict, obj_id, len(obj) if len(obj) > self.max_length else 0,
+                        tuple(keys), self._fingerprint_items(values, depth, seen))
+
+            if isinstance(
+                obj, (types.FunctionType, types.MethodType, types.ModuleType, types.GeneratorType)
+            ):
+                return (cls, obj_id, obj.__name__)
+
+            if isinstance(obj, (bytes, range)):
+                return (cls, obj_id, obj)
+
+            if isinstance(obj, bytearray):
+                return (bytearray, obj_id, len(obj) if len(obj) > 50 else bytes(obj))
+
+            if hasattr(obj, "__dict__"):
+                return (cls, obj_id, self._fingerprint_recursive(obj.__dict__, depth + 1, seen))
+
+            return (cls, str(obj))
+
+        except Exception:
+            # never equal to anything, so the caller re-serializes
+            return (object(),)
+        finally:
+            if obj_id in seen:
+                seen.remove(obj_id)
+
+    def _fingerprint_items(self, items, depth, seen):
+        kinds = tuple(map(type, items))
+        if _PRIMITIVE_TYPES.issuperset(kinds):
+            # common case: no nested objects, compare values in bulk
+            return (kinds, tuple(items))
+        return tuple([self._fingerprint_recursive(x, depth + 1, seen) for x in items])
+
     # private function to serialize objects
     def _serialize_recursive(self, obj, depth, seen):
         # recursively go through the object
@@ -22,7 +120,7 @@ class Serializer:
             return str(type(obj).__name__) + "(...)"
 
         # memory bomb check (1MB limit)
-        if sys.getsizeof(obj, 0) > 1024 * 1024:
+        if sys.getsizeof(obj, 0) > _SIZE_LIMIT:
             return "<Data too large to visualize>"
 
         try:
@@ -144,3 +242,45 @@ class Serializer:
         finally:
             if obj_id in seen:
                 seen.remove(obj_id)
+
+
+class SerializerSession(Serializer):
+    """Serializer that interns heap-object payloads across calls.
+
+    Every list/dict/object payload is remembered together with the
+    fingerprint it was built from. As long as the fingerprint stays the
+    same, later calls (other variables, later steps) get the very same
+    payload dict back instead of a fresh copy, so payloads must be treated
+    as immutable. `heap` maps each ``__ref__`` to its latest payload.
+    """
+
+    def __init__(self, max_depth=3, max_length=20):
+        super().__init__(max_depth=max_depth, max_length=max_length)
+        self.heap = {}
+        # (id, depth) -> (fingerprint, payload); depth matters because it
+        # decides where the payload is cut off with "type(...)"
+        self._interned = {}
+        self.hits = 0
+        self.misses = 0
+
+    def reset(self):
+        self.heap.clear()
+        self._interned.clear()
+
+    def _serialize_recursive(self, obj, depth, seen):
+        if type(obj) in _PRIMITIVE_TYPES or depth > self.max_depth or id(obj) in seen:
+            return super()._serialize_recursive(obj, depth, seen)
+
+        key = (id(obj), depth)
+        fingerprint = self._fingerprint_recursive(obj, depth, seen)
+        entry = self._interned.get(key)
+        if entry is not None and entry[0] == fingerprint:
+            self.hits += 1
+            return entry[1]
+
+        self.misses += 1
+        payload = super()._serialize_recursive(obj, depth, seen)
+        if isinstance(payload, dict) and "__ref__" in payload:
+            self._interned[key] = (fingerprint, payload)
+            self.heap[payload["__ref__"]] = payload
+        return payload